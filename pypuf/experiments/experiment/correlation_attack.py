@@ -37,6 +37,9 @@ class Parameters(NamedTuple):
     convergence_decimals: float
     shuffle: bool
 
+    # Number of permuted models learned at once, see CorrelationAttack.learn_permutations
+    concurrent_restarts: int = 1
+
 
 class Result(NamedTuple):
     """
@@ -99,6 +102,7 @@ class ExperimentCorrelationAttack(Experiment):
         self.mini_batch_size = parameters.mini_batch_size or 0
         self.convergence_decimals = parameters.convergence_decimals or 2
         self.shuffle = parameters.shuffle or False
+        self.concurrent_restarts = parameters.concurrent_restarts or 1
         self.seed_instance = parameters.seed_instance
         self.instance_prng = RandomState(seed=self.seed_instance)
         self.seed_model = parameters.seed_model
@@ -138,6 +142,7 @@ class ExperimentCorrelationAttack(Experiment):
             convergence_decimals=self.convergence_decimals,
             shuffle=self.shuffle,
             logger=self.progress_logger,
+            concurrent_restarts=self.concurrent_restarts,
         )
         self.model = self.learner.learn()
 
@@ -2,19 +2,48 @@
 This module provides an attack on XOR Arbiter PUFs that is based off known correlation in sub-challenge generation of
 the input transformation.
 """
+import logging
 from copy import deepcopy
+from heapq import heappush, heappushpop, nlargest
 from itertools import permutations
-from scipy.io import loadmat
+from math import factorial
+from multiprocessing import Pool
+from os import chmod, remove, replace, path
+from tempfile import mkstemp
 from numpy.random import RandomState
-from numpy import empty, roll, count_nonzero, sign, zeros
+from numpy.fft import rfft, irfft
+from numpy import empty, roll, count_nonzero, sign, array, arange, matmul, ascontiguousarray, concatenate, prod, \
+    tile, triu, ones, fill_diagonal, flatnonzero, zeros, rint, abs as np_abs, conj, load, save
 from pypuf.learner.base import Learner
 from pypuf.learner.regression.logistic_regression import LogisticRegression
 from pypuf.simulation.arbiter_based.ltfarray import LTFArray
-from pypuf.tools import ChallengeResponseSet
+from pypuf.tools import ChallengeResponseSet, WORD_TYPE, pack_bits, popcount, random_inputs
 from collections import namedtuple
 
 PermData = namedtuple('Permutation', ['permutation', 'accuracy'])
 
+# shift overviews of this process by n and number of chains, see CorrelationAttack.shift_overview
+_SHIFT_OVERVIEWS = {}
+
+# packed response signs of the process pool workers used by CorrelationAttack.find_high_accuracy_weight_permutations
+_WORKER_RESPONSE_SIGNS = None
+
+
+def _init_worker(negative_responses, negative_validation_responses, N):
+    """
+    Keeps the packed response signs in a process pool worker, see CorrelationAttack.packed_response_signs.
+    """
+    global _WORKER_RESPONSE_SIGNS  # pylint: disable=global-statement
+    _WORKER_RESPONSE_SIGNS = (negative_responses, negative_validation_responses, N)
+
+
+def _worker_search(arguments):
+    """
+    Searches permutations using the packed response signs of this process pool worker, see
+    CorrelationAttack.search_permutations.
+    """
+    return CorrelationAttack.search_permutations(*_WORKER_RESPONSE_SIGNS, *arguments)
+
 
 class CorrelationAttack(Learner):
     """
@@ -28,8 +57,20 @@ class CorrelationAttack(Learner):
     OPTIMIZATION_ACCURACY_UPPER_BOUND = .95
     OPTIMIZATION_ACCURACY_GOAL = .98
 
+    # number of chains whose assignments to slots are searched at once, see search_permutations
+    SEARCH_BATCH_CHAINS = 5
+
+    # shift overviews are computed for at least this many chains, see shift_overview
+    SHIFT_OVERVIEW_MIN_K = 10
+
+    # file name of cached shift overviews for given n and number of chains, in the data directory of the repository,
+    # see shift_overview
+    SHIFT_OVERVIEW_FILE = path.join(path.dirname(path.abspath(__file__)), path.pardir, path.pardir, path.pardir,
+                                    'data', 'correlation_permutations_lightweight_secure_%i_%i.npy')
+
     def __init__(self, n, k, training_set, validation_set, weights_mu=0, weights_sigma=1, weights_prng=RandomState(),
-                 lr_iteration_limit=1000, mini_batch_size=0, convergence_decimals=2, shuffle=False, logger=None):
+                 lr_iteration_limit=1000, mini_batch_size=0, convergence_decimals=2, shuffle=False, logger=None,
+                 workers=None, concurrent_restarts=1, prune_permutations=False):
         """
         Initialize a Correlation Attack Learner for the specified LTF Array which uses transform_lightweight_secure.
 
@@ -44,17 +85,31 @@ class CorrelationAttack(Learner):
         :param lr_iteration_limit: Iteration limit for a single LR learner run
         :param logger: logging.Logger
                        Logger which is used to log detailed information of learn iterations.
+        :param workers: None or int
+                        Number of processes used to search permutations with high accuracy, see
+                        find_high_accuracy_weight_permutations.
+        :param concurrent_restarts: int
+                                    Number of permuted models learned at once, see learn_permutations.
+        :param prune_permutations: bool
+                                   If True, permutations are skipped when the correlations of the adopted chains are
+                                   too weak to reach the required accuracy, see search_permutations. This is a
+                                   heuristic and may skip permutations with high accuracy.
         """
         self.n = n
         self.k = k
 
-        self.validation_set_efba = ChallengeResponseSet(
-            challenges=LTFArray.efba_bit(LTFArray.transform_lightweight_secure(validation_set.challenges, k)),
+        self.validation_set_transformed = ChallengeResponseSet(
+            challenges=LTFArray.transform_lightweight_secure(validation_set.challenges, k),
             responses=validation_set.responses
         )
 
         self.logger = logger
+        self.workers = workers
+        self.concurrent_restarts = concurrent_restarts
+        self.prune_permutations = prune_permutations
 
+        # the training set is transformed once in learn and shared by all runs of the LR learner
+        self.training_sub_challenges = None
         self.lr_learner = LogisticRegression(
             t_set=training_set,
             n=n,
@@ -80,12 +135,103 @@ class CorrelationAttack(Learner):
         self.best_permutation = None
         self.best_accuracy = None
 
-        assert n in (64, 128), 'Correlation attack for %i bit is currently not supported.' % n
         assert validation_set.N >= 1000, 'Validation set should contain at least 1000 challenges.'
 
-        self.correlation_permutations = loadmat(
-            'data/correlation_permutations_lightweight_secure_%i_10.mat' % n
-        )['shiftOverviewData'][:, :, 0].astype('int64')
+        shift_overview = self.shift_overview(n, k, logger)
+        self.correlation_permutations = shift_overview[:, :, 0].astype('int64')
+
+        # correlation of each chain adopted into each slot, as bias of the adopted chain's responses, i.e. 2 * p - 1,
+        # where p is the correlation of the sub-challenges of the original and the adopted chain (1 for unmoved
+        # chains), see shift_overview_data
+        self.correlation_bias = 2 * shift_overview[:k, :k, 1] - 1
+        fill_diagonal(self.correlation_bias, 1)
+
+        # stops all permuted models learned at once when one of them reaches the goal, see learn_permutations;
+        # the models are evaluated on the already transformed validation set once per epoch
+        self.goal_monitor = None
+        if concurrent_restarts > 1:
+            self.goal_monitor = LogisticRegression.ConvergenceMonitor(
+                test_set=self.validation_set_transformed.block_subset(1, 2),
+                transformation=None,
+                k=k,
+                interval=max(1, (training_set.N + 1) // self.lr_learner.minibatch_size),
+                target_accuracy=self.OPTIMIZATION_ACCURACY_GOAL,
+            )
+
+    @classmethod
+    def shift_overview(cls, n, k, logger=None):
+        """
+        Gives the shift overview of the lightweight secure transform for at least SHIFT_OVERVIEW_MIN_K chains, see
+        shift_overview_data. Each table is computed once and cached in SHIFT_OVERVIEW_FILE, from where it is
+        memory-mapped. Within a process, each table is loaded only once.
+        :param n: Input length
+        :param k: Number of parallel LTFs in the LTF Array
+        :param logger: logging.Logger
+                       Logger which is used to warn if a computed table cannot be cached.
+        :return: array of float of shape (max(k, SHIFT_OVERVIEW_MIN_K), max(k, SHIFT_OVERVIEW_MIN_K), 2)
+        """
+        k = max(k, cls.SHIFT_OVERVIEW_MIN_K)
+        if (n, k) not in _SHIFT_OVERVIEWS:
+            filename = cls.SHIFT_OVERVIEW_FILE % (n, k)
+            try:
+                shift_overview = load(filename, mmap_mode='r')
+            except FileNotFoundError:
+                shift_overview = cls.shift_overview_data(n, k)
+                try:
+                    # write to a temporary file first, so that concurrent processes never read incomplete tables
+                    (handle, temporary_filename) = mkstemp(suffix='.npy', dir=path.dirname(filename))
+                    try:
+                        with open(handle, 'wb') as file:
+                            save(file, shift_overview)
+                        chmod(temporary_filename, 0o644)
+                        replace(temporary_filename, filename)
+                    except OSError:
+                        remove(temporary_filename)
+                        raise
+                except OSError as error:
+                    (logger or logging).warning('Could not cache the shift overview in %s: %s' % (filename, error))
+            _SHIFT_OVERVIEWS[(n, k)] = shift_overview
+        return _SHIFT_OVERVIEWS[(n, k)]
+
+    @staticmethod
+    def shift_overview_data(n, k, N=10000, random_instance=None, block_size=100):
+        """
+        Computes for each pair of chains of the lightweight secure transform the shift that adopts the weights of
+        the first chain into the slot of the second, and the correlation this exploits: For all but a few bits, the
+        sub-challenges of the second chain equal the sub-challenges of the first chain cyclically shifted (with the
+        constant input of the bias weight appended), up to a sign that depends on the challenge. Hence, the shift
+        maximizes the mean absolute correlation of the shifted and the original sub-challenges on N random
+        challenges. The correlations of all shifts are circular cross-correlations and computed via FFT.
+        The result has the layout of shiftOverviewData of the MATLAB files previously used, i.e. for chains l != m,
+        [l, m, 0] is the shift and [l, m, 1] the correlation; both are 0 for l = m.
+        :param n: Input length
+        :param k: Number of parallel LTFs in the LTF Array
+        :param N: Number of random challenges used to estimate the correlations
+        :param random_instance: numpy.random.RandomState to draw the challenges from, defaults to a fixed seed
+        :param block_size: Number of challenges processed at once
+        :return: array of float of shape (k, k, 2)
+        """
+        if random_instance is None:
+            random_instance = RandomState(0)
+        challenges = random_inputs(n, N, random_instance)
+        correlations = zeros((k, k, n + 1))
+        sub_challenges = ones((block_size, k, n + 1))
+        for start in range(0, N, block_size):
+            block = LTFArray.transform_lightweight_secure(challenges[start:start + block_size], k)
+            block_sub_challenges = sub_challenges[:len(block)]
+            block_sub_challenges[:, :, :n] = block
+
+            # cross[i, l, m, s] is the dot product of the l-th sub-challenge rolled by s with the m-th sub-challenge
+            spectrum = rfft(block_sub_challenges, axis=2)
+            cross = irfft(conj(spectrum[:, :, None, :]) * spectrum[:, None, :, :], n=n + 1, axis=3)
+            correlations += np_abs(rint(cross)).sum(axis=0)
+        correlations /= N * (n + 1)
+
+        shift_overview = zeros((k, k, 2))
+        shift_overview[:, :, 0] = correlations.argmax(axis=2)
+        shift_overview[:, :, 1] = correlations.max(axis=2)
+        shift_overview[arange(k), arange(k)] = 0
+        return shift_overview
 
     def learn(self):
         """
@@ -94,10 +240,12 @@ class CorrelationAttack(Learner):
         :return: pypuf.simulation.arbiter_based.LTFArray
                  The computed model.
         """
-        self.initial_model = initial_model = self.lr_learner.learn()
+        self.training_sub_challenges = self.lr_learner.sub_challenges_of(
+            self.lr_learner.training_set.challenges, LTFArray.transform_lightweight_secure, self.k)
+        self.initial_model = initial_model = self.lr_learner.learn(sub_challenges=self.training_sub_challenges)
         self.logger.debug('initial weights for corr attack:')
         self.logger.debug(','.join(map(str, initial_model.weight_array.flatten())))
-        self.initial_accuracy = self.approx_accuracy(initial_model, self.validation_set_efba.block_subset(0, 2))
+        self.initial_accuracy = self.approx_accuracy(initial_model, self.validation_set_transformed.block_subset(0, 2))
         self.initial_lr_iterations = self.lr_learner.iteration_count
         self.total_lr_iterations = self.initial_lr_iterations
         initial_updater = self.lr_learner.updater
@@ -125,14 +273,8 @@ class CorrelationAttack(Learner):
 
         best_model = initial_model
         self.logger.debug('Trying %i permuted weights.' % len(high_accuracy_permutations))
-        for (iteration, perm_data) in enumerate(high_accuracy_permutations):
-            self.total_permutation_iterations += 1
-            weights = self.adopt_weights(initial_model.weight_array, perm_data.permutation)
-            self.lr_learner.updater = deepcopy(initial_updater)
-            self.lr_learner.updater.step_size *= 10
-            model = self.lr_learner.learn(init_weight_array=weights, refresh_updater=False)
-            self.total_lr_iterations += self.lr_learner.iteration_count
-            accuracy = self.approx_accuracy(model, self.validation_set_efba.block_subset(1, 2))
+        for (iteration, perm_data, model) in self.learn_permutations(high_accuracy_permutations, initial_updater):
+            accuracy = self.approx_accuracy(model, self.validation_set_transformed.block_subset(1, 2))
             self.logger.debug(
                 'With permutation no %d=%s, after restarting the learning we achieved accuracy %.4f -> %.4f!' %
                 (iteration, perm_data.permutation, perm_data.accuracy, accuracy))
@@ -156,41 +298,244 @@ class CorrelationAttack(Learner):
         self.logger.debug('After trying all permutations, we found a model with acc. %.2f.' % self.best_accuracy)
         return best_model
 
+    def learn_permutations(self, high_accuracy_permutations, initial_updater):
+        """
+        Restarts the LR learner on the initial model adopted with each of the given permutations, continuing with
+        the initial model's updater at increased step size. The permuted models are learned concurrent_restarts at a
+        time, see LogisticRegression.learn_restarts; all models learned at once are cancelled as soon as one of them
+        reaches OPTIMIZATION_ACCURACY_GOAL on the validation set, which then continues learning until it converged.
+        :param high_accuracy_permutations: list of PermData, see find_high_accuracy_weight_permutations
+        :param initial_updater: LogisticRegression.ModelUpdate of the initial LR run
+        :return: generator of tuples of the index of the permutation, its PermData and the learned model
+        """
+        for start in range(0, len(high_accuracy_permutations), self.concurrent_restarts):
+            batch = high_accuracy_permutations[start:start + self.concurrent_restarts]
+            self.total_permutation_iterations += len(batch)
+            updaters = []
+            for _ in batch:
+                updater = deepcopy(initial_updater)
+                updater.step_size *= 10
+                updaters.append(updater)
+
+            if len(batch) == 1:
+                self.lr_learner.updater = updaters[0]
+                weights = self.adopt_weights(self.initial_model.weight_array, batch[0].permutation)
+                models = [self.lr_learner.learn(init_weight_array=weights, refresh_updater=False,
+                                                sub_challenges=self.training_sub_challenges)]
+                self.total_lr_iterations += self.lr_learner.iteration_count
+            else:
+                self.lr_learner.learn_restarts(
+                    restarts=len(batch),
+                    init_weight_arrays=self.adopt_weights_batch(
+                        self.initial_model.weight_array,
+                        array([perm_data.permutation for perm_data in batch]),
+                    ),
+                    updaters=updaters,
+                    monitor=self.goal_monitor,
+                    sub_challenges=self.training_sub_challenges,
+                )
+                models = [restart.model for restart in self.lr_learner.restarts]
+                self.total_lr_iterations += sum(restart.epoch_count for restart in self.lr_learner.restarts)
+
+                # the other models were cancelled, the model reaching the goal continues learning until it converged
+                for restart, updater in zip(self.lr_learner.restarts, updaters):
+                    if restart.stop_reason == 'target accuracy reached':
+                        self.lr_learner.updater = updater
+                        restart.model.weight_array = self.lr_learner.learn(
+                            init_weight_array=restart.model.weight_array.copy(), refresh_updater=False,
+                            sub_challenges=self.training_sub_challenges,
+                        ).weight_array
+                        self.total_lr_iterations += self.lr_learner.iteration_count
+
+            for offset, (perm_data, model) in enumerate(zip(batch, models)):
+                yield start + offset, perm_data, model
+
     def find_high_accuracy_weight_permutations(self, weights, threshold):
         """
         Gives permutations for the weight-array resulting in the highest model accuracies.
+        The permutations are searched lazily, see search_permutations. All permutations are considered, unless
+        prune_permutations is set. If this attack has more than one worker, the search is distributed to a pool of
+        processes by the slot of the first chain.
         :param weights: The original weight-array
         :param threshold: Minimum accuracy to consider
         :return: The 5k permutations with the highest accuracy
         """
-        high_accuracy_permutations = []
-        adopted_instance = LTFArray(
-            weight_array=zeros((self.k, self.n)),
-            transform=LTFArray.transform_lightweight_secure,
-            combiner=LTFArray.combiner_xor
+        count = 5 * self.k
+        N = self.validation_set_transformed.N
+        response_signs = self.packed_response_signs(weights)
+        correlation_bias = self.correlation_bias if self.prune_permutations else None
+        if self.workers and self.workers > 1:
+            with Pool(self.workers, initializer=_init_worker, initargs=response_signs + (N,)) as pool:
+                results = pool.map(_worker_search, [
+                    (correlation_bias, threshold, count, (slot,)) for slot in range(self.k)
+                ])
+            results = [result for worker_results in results for result in worker_results]
+        else:
+            results = self.search_permutations(*response_signs, N, correlation_bias, threshold, count)
+
+        # by descending accuracy, permutations in the order of itertools.permutations for equal accuracies
+        high_accuracy_permutations = [
+            PermData(permutation, accuracy) for accuracy, _, permutation in nlargest(count, results)
+        ]
+        self.logger.debug('Found %i permutations with accuracy of at least %.4f' %
+                          (len(high_accuracy_permutations), threshold))
+        return high_accuracy_permutations
+
+    @classmethod
+    def search_permutations(cls, negative_responses, negative_validation_responses, N, correlation_bias, threshold,
+                            count, prefix=()):
+        """
+        Searches the permutations (other than the identity) with the highest accuracy, see packed_accuracies.
+        Permutations are built chain by chain, the XOR of the response signs of the chains assigned so far is shared
+        by all permutations extending the partial assignment. The assignments of the last SEARCH_BATCH_CHAINS chains
+        are evaluated at once. Only the count best permutations seen so far are kept.
+        If correlation_bias is given, partial assignments are pruned by the accuracy that can be expected of any
+        permutation extending them: assuming an accurate original model and independent chains, adopting chains with
+        correlation biases c_l gives an accuracy of about 1/2 + 1/2 prod c_l. This estimate is compared to threshold,
+        or the worst accuracy kept, once count permutations are kept. Note that the estimate is a heuristic, pruned
+        permutations may still have had sufficient accuracy.
+        :param negative_responses: array of WORD_TYPE of shape (k, k, W), see packed_response_signs
+        :param negative_validation_responses: array of WORD_TYPE of shape (W,), see packed_response_signs
+        :param N: int size of the validation set
+        :param correlation_bias: None or array of float of shape (k, k), the correlation bias of each chain adopted
+                                 into each slot
+        :param threshold: Minimum accuracy to consider
+        :param count: Maximum number of permutations returned
+        :param prefix: Only permutations beginning with this assignment of slots are searched.
+        :return: list of at most count tuples of accuracy, negated rank in the order of itertools.permutations, and
+                 the permutation as tuple
+        """
+        k = negative_responses.shape[0]
+        identity = arange(k)
+        rank_weights = array([factorial(k - 1 - l) for l in range(k)])
+        later = triu(ones((k, k), dtype=bool), 1)
+        best = []
+
+        def minimum_accuracy():
+            return best[0][0] if len(best) == count else threshold
+
+        def keep(candidates, accuracies):
+            # rank in lexicographic order, i.e. in the order of itertools.permutations
+            ranks = ((candidates[:, None, :] < candidates[:, :, None]) & later).sum(axis=2) @ rank_weights
+            for i in flatnonzero(accuracies >= minimum_accuracy()):
+                if (candidates[i] == identity).all():
+                    continue
+                result = (accuracies[i], -ranks[i], tuple(candidates[i].tolist()))
+                if len(best) < count:
+                    heappush(best, result)
+                else:
+                    heappushpop(best, result)
+
+        def search(assignment, mispredictions, bias):
+            depth = len(assignment)
+            remaining = [slot for slot in range(k) if slot not in assignment]
+            if correlation_bias is not None and .5 + .5 * bias < minimum_accuracy():
+                return
+            if k - depth > cls.SEARCH_BATCH_CHAINS:
+                for slot in remaining:
+                    search(
+                        assignment + (slot,),
+                        mispredictions ^ negative_responses[depth, slot],
+                        bias * correlation_bias[depth, slot] if correlation_bias is not None else bias,
+                    )
+                return
+
+            # evaluate all assignments of the remaining chains at once
+            completions = array(list(permutations(remaining)), dtype=int).reshape(-1, k - depth)
+            candidates = concatenate((tile(array(assignment, dtype=int), (len(completions), 1)), completions), axis=1)
+            if correlation_bias is not None:
+                estimates = .5 + .5 * bias * prod(correlation_bias[arange(depth, k), completions], axis=1)
+                candidates = candidates[estimates >= minimum_accuracy()]
+            keep(candidates, cls.packed_accuracies(candidates, negative_responses, mispredictions, N, depth))
+
+        initial_mispredictions = negative_validation_responses.copy()
+        initial_bias = 1
+        for l, slot in enumerate(prefix):
+            initial_mispredictions ^= negative_responses[l, slot]
+            initial_bias *= correlation_bias[l, slot] if correlation_bias is not None else 1
+        search(tuple(prefix), initial_mispredictions, initial_bias)
+        return best
+
+    def response_cube(self, weights):
+        """
+        Computes the responses of each chain of the given weights, adopted into each slot, to the validation set.
+        :param weights: A weight-array of an LTFArray
+        :return: array of float of shape (N, k, k), where [i, l, j] is the response of the l-th chain, adopted into
+                 the j-th slot (see adopt_weights), to the i-th validation challenge
+        """
+        # the k cyclic permutations adopt each chain into each slot exactly once
+        cyclic_permutations = (arange(self.k)[None, :] + arange(self.k)[:, None]) % self.k
+        responses = self.chain_responses(
+            self.adopt_weights_batch(weights, cyclic_permutations),
+            self.validation_set_transformed.challenges,
         )
-        for permutation in list(permutations(range(self.k)))[1:]:
-            adopted_instance.weight_array = self.adopt_weights(weights, permutation)
-            accuracy = self.approx_accuracy(adopted_instance)
-            self.logger.debug('For permutation %s, we have accuracy %.4f' % (permutation, accuracy))
-            if accuracy >= threshold:
-                high_accuracy_permutations.append(PermData(permutation, accuracy))
+        chains, slots = arange(self.k)[:, None], arange(self.k)[None, :]
+        return responses[:, (slots - chains) % self.k, slots]
 
-        high_accuracy_permutations.sort(key=lambda x: -x.accuracy)
-        return high_accuracy_permutations[:5 * self.k]
+    def packed_response_signs(self, weights):
+        """
+        Gives the signs of the response cube and of the validation set responses as packed bits, see tools.pack_bits.
+        :param weights: A weight-array of an LTFArray
+        :return: array of WORD_TYPE of shape (k, k, W) with bit i of [l, j] set iff the response of the l-th chain,
+                 adopted into the j-th slot, to the i-th validation challenge is negative, and
+                 array of WORD_TYPE of shape (W,) with bit i set iff the i-th validation response is negative
+        """
+        return (
+            pack_bits(self.response_cube(weights).transpose(1, 2, 0) < 0),
+            pack_bits(self.validation_set_transformed.responses < 0),
+        )
+
+    @staticmethod
+    def packed_accuracies(candidates, negative_responses, negative_validation_responses, N, first_chain=0):
+        """
+        Approximates the accuracy of permuted models from the packed response signs, see packed_response_signs.
+        The XOR of the chain responses is negative iff an odd number of chain responses is negative, hence a permuted
+        model mispredicts the i-th challenge iff bit i of the XOR of all its chain's and the validation set's packed
+        response signs is set. Note that chain responses of exactly zero are considered positive.
+        :param candidates: array of int of shape (P, k), permutations as returned from itertools.permutations
+        :param negative_responses: array of WORD_TYPE of shape (k, k, W)
+        :param negative_validation_responses: array of WORD_TYPE of shape (W,)
+        :param N: int size of the validation set
+        :param first_chain: int, if given, the packed response signs of the chains before are assumed to be already
+                            XORed into negative_validation_responses, see search_permutations.
+        :return: array of float of shape (P,), the accuracy of each permuted model
+        """
+        mispredictions = empty((len(candidates), len(negative_validation_responses)), dtype=WORD_TYPE)
+        mispredictions[:] = negative_validation_responses
+        for l in range(first_chain, candidates.shape[1]):
+            mispredictions ^= negative_responses[l, candidates[:, l]]
+        return (N - popcount(mispredictions)) / N
+
+    @staticmethod
+    def chain_responses(weight_arrays, sub_challenges):
+        """
+        Computes the responses of each chain of several models on the given sub-challenges at once.
+        :param weight_arrays: array of float of shape (P, k, n+1), weight arrays (including bias) of P models
+        :param sub_challenges: array of int of shape (N, k, n)
+        :return: array of float of shape (N, P, k)
+        """
+        (N, k, n) = sub_challenges.shape
+        responses = empty((N, len(weight_arrays), k), dtype=weight_arrays.dtype)
+        for l in range(k):
+            # responses of the l-th Arbiter chain of all models as one matrix product
+            responses[:, :, l] = matmul(ascontiguousarray(sub_challenges[:, l, :], dtype=weight_arrays.dtype),
+                                        weight_arrays[:, l, :n].T)
+            responses[:, :, l] += weight_arrays[:, l, n]
+        return responses
 
-    def approx_accuracy(self, instance, efba_set=None):
+    def approx_accuracy(self, instance, transformed_set=None):
         """
         Approximate the accuracy of the instance on the given set.
         :param instance: pypuf.simulation.arbiter_based.LTFArray
-        :param efba_set: A challenge-response-set containing efba sub-challenges (default: self.validation_set_efba)
+        :param transformed_set: A challenge-response-set containing sub-challenges
+                                (default: self.validation_set_transformed)
         :return: Accuracy of the instance
         """
-        if efba_set is None:
-            efba_set = self.validation_set_efba
-        size = efba_set.N
-        responses = sign(instance.combiner(instance.core_eval(efba_set.challenges)))
-        return count_nonzero(responses == efba_set.responses) / size
+        if transformed_set is None:
+            transformed_set = self.validation_set_transformed
+        size = transformed_set.N
+        responses = sign(instance.combiner(instance.core_eval(transformed_set.challenges, bias=True)))
+        return count_nonzero(responses == transformed_set.responses) / size
 
     def adopt_weights(self, weights, permutation):
         """
@@ -204,3 +549,17 @@ class CorrelationAttack(Learner):
             adopted_weights[permutation[l], :] = \
                 roll(weights[l, :], self.correlation_permutations[l, permutation[l]])
         return adopted_weights
+
+    def adopt_weights_batch(self, weights, candidates):
+        """
+        Adopts the weights with each of the given permutations, see adopt_weights.
+        :param weights: A weight-array of an LTFArray
+        :param candidates: array of int of shape (P, k), permutations as returned from itertools.permutations
+        :return: array of float of shape (P, k, n+1), the permuted weight-arrays
+        """
+        (P, m) = (len(candidates), weights.shape[1])
+        adopted_weights = empty((P, self.k, m))
+        for l in range(self.k):
+            shifts = self.correlation_permutations[l, candidates[:, l]]
+            adopted_weights[arange(P), candidates[:, l], :] = weights[l, (arange(m) - shifts[:, None]) % m]
+        return adopted_weights
@@ -4,16 +4,23 @@ Heavily based on the work of Rührmair, Ulrich, et al. "Modeling attacks on phys
 of the 17th ACM conference on Computer and communications security. ACM, 2010.
 """
 import logging
+from contextlib import closing
+from copy import copy
 from math import ceil
+from time import time
+from typing import NamedTuple
 
-from numpy import abs as np_abs, zeros, count_nonzero, average, absolute
-from numpy import dtype, sign, dot, exp, array, seterr, minimum, full, amin, amax, array_split
+from numpy import abs as np_abs, zeros, count_nonzero, average, absolute, sum as np_sum
+from numpy import dtype, sign, exp, seterr, minimum, full, array_split, einsum, arange, maximum, divide, \
+    ones, cumprod, cumsum, sort, ascontiguousarray, matmul, empty
 from numpy.linalg import norm
 from numpy.random import RandomState
 
 from pypuf.learner.base import Learner
+from pypuf.learner.regression.model_update import ModelUpdate, RPropModelUpdate, IRPropMinusModelUpdate, \
+    AdamModelUpdate
 from pypuf.simulation.arbiter_based.ltfarray import LTFArray
-from pypuf.tools import compare_functions, TrainingSet, approx_dist_nonrandom
+from pypuf.tools import compare_functions, TrainingSet, ChallengeResponseSet, PackedChallenges, prefetched
 
 
 class LogisticRegression(Learner):
@@ -24,99 +31,142 @@ class LogisticRegression(Learner):
     models that fit the LTF Array as defined in the constructor.
     """
 
-    class ModelUpdate(object):
+    # Derivatives of the supported combiner functions, by combiner name, see register_combiner_gradient.
+    COMBINER_GRADIENTS = {}
+
+    # Default memory budget in bytes for the temporary arrays of batch_gradient, see max_memory.
+    BATCH_GRADIENT_MAX_MEMORY = 2**27
+
+    # Number of temporary arrays of shape (R, block_size, k) allocated by batch_gradient for R models, used to
+    # translate max_memory into a block size, see batch_gradient_block_size.
+    BATCH_GRADIENT_MEMORY_FACTOR = 4
+
+    # Number of bit-packed challenges that are unpacked at once, see sub_challenges_of.
+    UNPACK_BLOCK_SIZE = 10**5
+
+    # Model updates, see pypuf.learner.regression.model_update.
+    ModelUpdate = ModelUpdate
+    RPropModelUpdate = RPropModelUpdate
+    IRPropMinusModelUpdate = IRPropMinusModelUpdate
+    AdamModelUpdate = AdamModelUpdate
+
+    class ConvergenceMonitor(object):
         """
-        Model update according to the naive algorithm. Works, but is really slow to converge.
+        Monitors the accuracy of the model on a test set while learning and decides when to stop learning early.
+        The test set is transformed only once, the model is then evaluated on the cached sub-challenges every
+        interval gradient steps or after time_interval seconds, whichever comes first.
         """
 
-        def __init__(self, model):
+        def __init__(self, test_set, transformation, k, interval=1, time_interval=None, patience=None,
+                     target_accuracy=None):
             """
-            :param model: pypuf.simulation.arbiter_based.ltfarray.LTFArray
-                          Model which is used to model a PUF.
+            :param test_set: pypuf.tools.ChallengeResponseSet
+                             Challenge response pairs to evaluate the model on.
+            :param transformation: Input transformation used by the model, or None if the test set already holds the
+                                   sub-challenges of shape (N, k, n).
+            :param k: Number of parallel LTFs of the model
+            :param interval: int
+                             Number of gradient steps after which the model is evaluated.
+            :param time_interval: None or float
+                                  Number of seconds after which the model is evaluated, regardless of interval.
+            :param patience: None or int
+                             Number of evaluations without improvement of the best accuracy after which learning
+                             is stopped, None to never stop for lack of improvement.
+            :param target_accuracy: None or float
+                                    Accuracy at which learning is stopped, None to never stop for success.
             """
-            self.model = model
-
-        def update(self, gradient):
+            self.sub_challenges = test_set.challenges
+            if transformation is not None:
+                self.sub_challenges = LogisticRegression.sub_challenges_of(test_set.challenges, transformation, k)
+            self.responses = test_set.responses
+            self.interval = interval
+            self.time_interval = time_interval
+            self.patience = patience
+            self.target_accuracy = target_accuracy
+            self.accuracy = None
+            self.best_accuracy = None
+            self.best_step = None
+            self.best_evaluation = None
+            self.evaluation_count = 0
+            self.stop_reason = None
+            self.step_count = 0
+            self.last_evaluation_step = 0
+            self.last_evaluation_time = None
+
+        def reset(self, model):
             """
-            Use the gradient scaled with a constant to determine the update step.
-            :param gradient: array of float
-            :return: array of float
+            Starts monitoring a new run of the learner by evaluating the initial model.
+            :param model: pypuf.simulation.arbiter_based.ltfarray.LTFArray
             """
-            return -.3 * gradient
-
-    class RPropModelUpdate(ModelUpdate):
-        """
-        Model update according to the Resilient Backpropagation algorithm. For details, see update() method.
-        """
-
-        def __init__(self, model, bias=False, eta_minus=0.5, eta_plus=1.2):
+            self.best_accuracy = None
+            self.best_step = None
+            self.best_evaluation = None
+            self.evaluation_count = 0
+            self.stop_reason = None
+            self.step_count = 0
+            self.evaluate(model)
+
+        def evaluate(self, model):
             """
+            Evaluates the model on the test set and keeps track of the best accuracy.
             :param model: pypuf.simulation.arbiter_based.ltfarray.LTFArray
-            :param eta_minus: float
-            :param eta_plus: float
+            :return: float accuracy of the model on the test set
             """
-            self.n = n = model.n
-            self.k = k = model.k
-
-            self.eta_minus = eta_minus
-            self.eta_plus = eta_plus
-            self.delta_min = 10 ** -4
-            self.delta_max = 10 ** +1
-            self.last_gradient = full((k, n + 1 if bias else n), 1.0)
-            self.last_step_size = full((k, n + 1 if bias else n), 0.0)
-            self.step_size = full((k, n + 1 if bias else n), 1.0)
-            self.step = full((k, n + 1 if bias else n), 0.0)
-            self.step_size_max = full(self.n + 1 if bias else n, self.delta_max, dtype('float64'))
-            self.step_size_min = full(self.n + 1 if bias else n, self.delta_min, dtype('float64'))
-
-            super().__init__(model)
-
-        def update(self, gradient):
+            model_responses = sign(model.combiner(model.ltf_eval(self.sub_challenges)))
+            self.accuracy = count_nonzero(model_responses == self.responses) / len(self.responses)
+            self.evaluation_count += 1
+            self.last_evaluation_step = self.step_count
+            self.last_evaluation_time = time()
+            if self.best_accuracy is None or self.accuracy > self.best_accuracy:
+                self.best_accuracy = self.accuracy
+                self.best_step = self.step_count
+                self.best_evaluation = self.evaluation_count
+            return self.accuracy
+
+        def update(self, model):
             """
-            Compute update step according to "Resilient Backpropagation" by
-            Riedmiller, Martin, and Heinrich Braun. "A direct adaptive method for faster backpropagation learning:
-            The RPROP algorithm."
-            Neural Networks, 1993., IEEE International Conference on. IEEE, 1993.
-
-            Implementation following the neat implementation used in
-            Rührmair, Ulrich, et al. "Modeling attacks on physical unclonable functions."
-            Proceedings of the 17th ACM conference on Computer and communications security.
-            ACM, 2010.
-
-            For their original code, please see http://www.pcp.in.tum.de/code/lr.zip,
-            predictor.py:299
-            :param gradient array of float
-            :return: array of float
+            Registers a gradient step of the learner, evaluates the model if due and checks whether learning should be
+            stopped.
+            :param model: pypuf.simulation.arbiter_based.ltfarray.LTFArray
+            :return: bool True if learning should be stopped, see stop_reason
             """
-            for l, grad_l in enumerate(gradient):
-                step_indicator = sign(grad_l * self.last_gradient[l])
-
-                self.step_size[l][step_indicator > 0] *= self.eta_plus
-                self.step_size[l][step_indicator < 0] *= self.eta_minus
-
-                self.step_size[l] = amin((self.step_size[l], self.step_size_max), 0)
-                self.step_size[l] = amax((self.step_size[l], self.step_size_min), 0)
-
-                self.step[l][step_indicator > 0] = -(
-                    self.step_size[l][step_indicator > 0] * sign(grad_l[step_indicator > 0])
-                )
-                self.step[l][step_indicator < 0] = -self.last_step_size[l][step_indicator < 0]
-                self.step[l][step_indicator == 0] = -self.step_size[l][step_indicator == 0] * sign(
-                    grad_l[step_indicator == 0])
-
-                self.last_gradient[l] = grad_l
-                self.last_gradient[l][step_indicator < 0] = 0
-                self.last_step_size[l] = self.step[l]
-
-            return self.step
+            self.step_count += 1
+            due = self.step_count - self.last_evaluation_step >= self.interval
+            if self.time_interval is not None:
+                due = due or time() - self.last_evaluation_time >= self.time_interval
+            if not due:
+                return False
+
+            self.evaluate(model)
+            if self.target_accuracy is not None and self.accuracy >= self.target_accuracy:
+                self.stop_reason = 'target accuracy reached'
+            elif self.patience is not None and self.evaluation_count - self.best_evaluation > self.patience:
+                self.stop_reason = 'no improvement'
+            return self.stop_reason is not None
+
+    class Restart(NamedTuple):
+        """
+        One of the models learned by learn_restarts and its statistics.
+        """
+        model: LTFArray
+        converged: bool
+        stop_reason: str
+        epoch_count: int
+        gradient_step_count: int
+        training_set_accuracy: float
+        test_set_accuracy: float
 
     def __init__(self, t_set, n, k, transformation=LTFArray.transform_id, combiner=LTFArray.combiner_xor, weights_mu=0,
                  weights_sigma=1, weights_prng=RandomState(), logger=None, iteration_limit=10000, minibatch_size=None,
-                 convergence_decimals=2, shuffle=False, test_set: TrainingSet = None, bias=False):
+                 convergence_decimals=2, shuffle=False, test_set: TrainingSet = None, bias=False, precision='float64',
+                 streaming=False, prefetch=0, test_interval=1, test_time_interval=None, patience=None,
+                 target_accuracy=None, model_update=None, max_memory=None):
         """
         Initialize a LTF Array Logistic Regression Learner for the specified LTF Array.
 
-        :param t_set: The training set, i.e. a data structure containing challenge response pairs
+        :param t_set: The training set, i.e. a data structure containing challenge response pairs. Bit-packed
+                      challenges (see pypuf.tools.PackedChallenges) are unpacked block by block when transformed;
+                      in streaming mode, only the challenges of the current block are ever unpacked.
         :param n: Input length
         :param k: Number of parallel LTFs in the LTF Array
         :param transformation: Input transformation used by the LTF Array
@@ -127,6 +177,38 @@ class LogisticRegression(Learner):
         :param weights_prng: PRNG to draw the initial model from. Defaults to fresh `numpy.random.RandomState` instance.
         :param logger: logging.Logger
                        Logger which is used to log detailed information of learn iterations.
+        :param precision: numpy floating point data type (or its name) used for the model weights, the gradient and
+                          the state of the model update. Using float32 halves the memory traffic of the gradient
+                          computation; challenges are kept in their own (integer) data type in any case.
+        :param streaming: If True, the training set is not transformed up front, but block by block within each
+                          gradient computation (see gradient), such that the transformed training set is never held
+                          in memory. The training set can then be larger than the available memory, e.g. when
+                          memory-mapped from disk using pypuf.tools.ChallengeResponseSet.load. Note that the
+                          challenges are transformed again in every epoch. When shuffling in streaming mode, the
+                          order of the minibatches is shuffled instead of the challenges, such that challenges are
+                          still read in contiguous blocks.
+        :param shuffle: If True, the training set is split into different minibatches in each epoch. The training set
+                        itself is not modified, instead each minibatch is gathered according to a random permutation
+                        that only depends on the epoch number.
+        :param prefetch: Number of minibatches prepared in advance by a background thread while the gradient of the
+                         current minibatch is computed, 0 to prepare minibatches when needed. In streaming mode,
+                         the background thread also transforms the challenges, such that up to prefetch + 1
+                         transformed minibatches are held in memory.
+        :param test_set: Challenge response pairs to monitor the accuracy of the model on while learning, see
+                         ConvergenceMonitor. The test set is transformed once when learning starts.
+        :param test_interval: Number of gradient steps after which the model is evaluated on the test set.
+        :param test_time_interval: None or number of seconds after which the model is evaluated on the test set,
+                                   regardless of test_interval.
+        :param patience: None or number of evaluations on the test set without improvement after which learning is
+                         stopped early. Requires a test set.
+        :param target_accuracy: None or accuracy on the test set at which learning is stopped early. Requires a test
+                                set.
+        :param model_update: Subclass of LogisticRegression.ModelUpdate used to update the model from the gradient,
+                             defaults to RPropModelUpdate. For variants of RPropModelUpdate, eta_minus and eta_plus
+                             are given to learn.
+        :param max_memory: None or int
+                           Approximate memory in bytes used for the temporary arrays when computing the gradients of
+                           several models at once, see batch_gradient. Defaults to BATCH_GRADIENT_MAX_MEMORY.
         """
         self.iteration_count = 0
         self.epoch_count = 0
@@ -142,7 +224,7 @@ class LogisticRegression(Learner):
         self.convergence_decimals = convergence_decimals
         self.transformation = transformation
         self.combiner = combiner
-        self.efba_sub_challenges = None
+        self.sub_challenges = None
         self.converged = False
         self.logger = logger or logging
         self.updater = None
@@ -152,6 +234,19 @@ class LogisticRegression(Learner):
         self.training_set_dist_sign = -1
         self.test_set_dist = -1
         self.bias = bias
+        self.precision = dtype(precision)
+        self.streaming = streaming
+        self.prefetch = prefetch
+        self.test_interval = test_interval
+        self.test_time_interval = test_time_interval
+        self.patience = patience
+        self.target_accuracy = target_accuracy
+        self.monitor = None
+        self.monitor_parameters = None
+        self.restarts = None
+        self.model_update = model_update or self.RPropModelUpdate
+        self.max_memory = max_memory or self.BATCH_GRADIENT_MAX_MEMORY
+        assert test_set or (patience is None and target_accuracy is None), 'Early stopping requires a test set.'
 
     @property
     def training_set(self):
@@ -170,53 +265,24 @@ class LogisticRegression(Learner):
         # pylint: disable-msg=W0201
         self.__training_set = val
 
-    def gradient(self, model, challenges, responses, block_size=10**5):
+    def gradient(self, model, challenges, responses, block_size=10**5, transformation=None):
         """
         Compute the gradient of the given model.
         :param model: pypuf.simulation.arbiter_based.LTFArray
         :param challenges: list of challenges to work on
         :param responses: list of responses to work on
         :param block_size: the gradient will be computed in blocks of this size
+        :param transformation: None or input transformation
+                               If given, challenges are (untransformed) master challenges of shape (N, n), which are
+                               transformed block by block using this transformation. Otherwise, challenges are
+                               sub-challenges of shape (N, k, n).
         :return: array of float
         """
 
         # define derivative depending on combiner function
-        def model_gradient_xor(_l, _combined_model_responses, _model_responses):
-            """
-            Caculates the gradient of the xored response at index l.
-            :param _l int
-                     Index for weight array and challange array.
-            :param _combined_model_responses: challenges to work on
-            :param _model_responses: responses to work on
-            :return array of float
-            """
-            #         Prod_i < w_i x_i >    /  < w_l x_l >          = Prod_(i \neq j)  < w_i x_i >
-            return _combined_model_responses / _model_responses[:, _l]
-
-        def model_gradient_ip_mod2(_l, _combined_model_responses, _model_responses):
-            """
-            Caculates the gradient of the ip_mod2 combined responses at index l.
-            :param _l int
-                     Index for weight array and challange array.
-            :param _combined_model_responses: challenges to work on
-            :param _model_responses: responses to work on
-            :return array of float
-            """
-            if _l % 2 == 0:  # for even l, the min operation takes place with the next value
-                neighbor = _model_responses[:, _l + 1]
-            else:  # for odd l, the min operation takes place with the previous value
-                neighbor = _model_responses[:, _l - 1]
+        model_gradient = self.combiner_gradient(self.combiner)
 
-            maximum = amax((_model_responses[:, _l], neighbor), 0)
-
-            return array([
-                0
-                if maximum[i] == neighbor[i] else
-                _combined_model_responses[i] / maximum[i]
-                for i in range(len(_model_responses))
-            ])
-
-        result = zeros(shape=(self.k, self.n + 1 if self.bias else self.n))
+        result = zeros(shape=(self.k, self.n + 1 if self.bias else self.n), dtype=self.precision)
         self.logger.debug(f'result shape {result.shape}, size {result.nbytes / 1024**3:.4f}GiB')
         block_num = 0
         block_num_total = ceil(len(challenges) / block_size)
@@ -228,10 +294,12 @@ class LogisticRegression(Learner):
                                   f'({block_num/block_num_total:.2f}) ...')
             block_num += 1
             block_challenges = challenges[start:start+block_size]
+            if transformation is not None:
+                block_challenges = self.sub_challenges_of(block_challenges, transformation, self.k)
             block_responses = responses[start:start+block_size]
 
             # compute model responses
-            model_responses = model.core_eval(block_challenges)
+            model_responses = model.core_eval(block_challenges, bias=self.bias)
             combined_model_responses = self.combiner(model_responses)
             combined_model_responses_sign = sign(combined_model_responses)
             training_set_dist_sign.append(
@@ -241,8 +309,7 @@ class LogisticRegression(Learner):
 
             # cap the absolute value of this to avoid overflow errors
             max_response_abs_value = 50
-            max_response_abs_value_array = full(len(combined_model_responses), max_response_abs_value, dtype('float64'))
-            combined_model_responses = combined_model_responses_sign * minimum(max_response_abs_value_array,
+            combined_model_responses = combined_model_responses_sign * minimum(max_response_abs_value,
                                                                                np_abs(combined_model_responses))
 
             # compute the derivative from
@@ -251,31 +318,203 @@ class LogisticRegression(Learner):
             sigmoid_derivative = .5 * (2 / (1 + exp(-combined_model_responses)) - 1 - block_responses)
             # equivalent to self.set.responses * (1 - 1/(1 + exp(-self.set.responses * combined_model_responses)))
 
-            # in a multiprocessing scenario the object references would not be the same!
-            if compare_functions(self.combiner, LTFArray.combiner_xor):
-                model_gradient = model_gradient_xor
-            elif compare_functions(self.combiner, LTFArray.combiner_ip_mod2):
-                model_gradient = model_gradient_ip_mod2
-            else:
-                raise Exception('No gradient function known for combiner %s' % self.combiner)
-
-            for l in range(self.k):
-                # sum over all challenges to the l-th Arbiter chain
-                # requires additional memory usage for intermediate results
-                gradient = sigmoid_derivative * model_gradient(l, combined_model_responses, model_responses)  # gradient
-                result[l] += dot(
-                    gradient,
-                    block_challenges[:, l]  # all challenges to the l-th Arbiter chain
-                )
+            # sub-challenges are given without the constant 1-bit for the bias, unless they are "efba"
+            challenge_length = block_challenges.shape[2]
+            # gradient[i, l] is the derivative of the loss of challenge i with respect to the response of the l-th LTF
+            gradient = sigmoid_derivative[:, None] * model_gradient(combined_model_responses, model_responses)
+            # for each Arbiter chain l, sum over all challenges to the l-th Arbiter chain, weighted by gradient[:, l]
+            result[:, :challenge_length] += einsum('il,ilj->lj', gradient, block_challenges)
+            if self.bias and challenge_length == self.n:
+                # the bias weight is multiplied with a constant 1-bit
+                result[:, -1] += np_sum(gradient, axis=0)
 
         self.training_set_dist = average(training_set_dist)
         self.training_set_dist_sign = average(training_set_dist_sign)
         return result
 
-    def learn(self, init_weight_array=None, eta_minus=0.5, eta_plus=1.2, refresh_updater=True):
+    @classmethod
+    def sub_challenges_of(cls, challenges, transformation, k):
+        """
+        Transforms challenges into sub-challenges. Bit-packed challenges are unpacked and transformed one block of
+        UNPACK_BLOCK_SIZE challenges at a time, such that all unpacked challenges are never held in memory at once.
+        :param challenges: array of int8 of shape (N, n) or pypuf.tools.PackedChallenges
+        :param transformation: input transformation
+        :param k: int number of sub-challenges per challenge
+        :return: array of shape (N, k, n)
+        """
+        if not isinstance(challenges, PackedChallenges):
+            return transformation(challenges, k)
+        sub_challenges = None
+        for start in range(0, len(challenges), cls.UNPACK_BLOCK_SIZE):
+            block = transformation(challenges[start:start + cls.UNPACK_BLOCK_SIZE].unpack(), k)
+            if sub_challenges is None:
+                sub_challenges = empty((len(challenges),) + block.shape[1:], dtype=block.dtype)
+            sub_challenges[start:start + len(block)] = block
+        return sub_challenges
+
+    def minibatches(self, challenges, responses, batches, transformation=None):
+        """
+        Generates the minibatches of one epoch.
+        :param challenges: array of (sub-)challenges
+        :param responses: array of responses, ordered accordingly
+        :param batches: list of slices or index arrays, one per minibatch, in the order they shall be used
+        :param transformation: None or input transformation that is applied to each minibatch of challenges
+        :return: generator of pairs of challenges and responses
+        """
+        for batch in batches:
+            batch_challenges = challenges[batch]
+            if transformation is not None:
+                batch_challenges = self.sub_challenges_of(batch_challenges, transformation, self.k)
+            yield batch_challenges, responses[batch]
+
+    @staticmethod
+    def batch_slices(N, number_of_batches):
+        """
+        Splits N challenges into contiguous minibatches of (almost) equal size, like numpy.array_split.
+        :param N: int number of challenges
+        :param number_of_batches: int number of minibatches
+        :return: list of slices
+        """
+        sizes = full(number_of_batches, N // number_of_batches)
+        sizes[:N % number_of_batches] += 1
+        ends = cumsum(sizes)
+        return [slice(end - size, end) for end, size in zip(ends, sizes)]
+
+    @classmethod
+    def register_combiner_gradient(cls, combiner, gradient):
+        """
+        Registers the derivative of a combiner function, such that the combiner can be used with this learner.
+        :param combiner: A function: array of float with shape(N,k) -> array of float with shape(N)
+                         The combiner function, see LTFArray.
+        :param gradient: A function: (array of float with shape (N,), array of float with shape (N,k))
+                         -> array of float with shape (N,k)
+                         Given the combined responses and the responses of all k LTFs, returns the derivative of
+                         the combined response with respect to each LTF's response.
+        """
+        cls.COMBINER_GRADIENTS[combiner.__name__] = (combiner, gradient)
+
+    @classmethod
+    def combiner_gradient(cls, combiner):
+        """
+        Returns the registered derivative of the given combiner function, see register_combiner_gradient.
+        :param combiner: A function: array of float with shape(N,k) -> array of float with shape(N)
+        :return: A function: (array of float with shape (N,), array of float with shape (N,k))
+                 -> array of float with shape (N,k)
+        """
+        registered_combiner, gradient = cls.COMBINER_GRADIENTS.get(getattr(combiner, '__name__', None), (None, None))
+        # in a multiprocessing scenario the object references would not be the same!
+        if registered_combiner is None or not compare_functions(combiner, registered_combiner):
+            raise Exception('No gradient function known for combiner %s' % combiner)
+        return gradient
+
+    @staticmethod
+    def combiner_gradient_xor(combined_model_responses, model_responses):
+        """
+        Caculates the gradient of the xored response with respect to the responses of all k LTFs, that is,
+        for each LTF l the product of the responses of all other LTFs, Prod_(i \neq l) < w_i x_i >.
+        These leave-one-out products are computed as products of prefix and suffix products, hence without dividing
+        by (possibly tiny) LTF responses.
+        If the given combined responses were capped (as done by LogisticRegression.gradient), the result is scaled
+        accordingly, i.e. it equals combined_model_responses / < w_l x_l >.
+        :param combined_model_responses: array of float of shape (N,), combined responses
+        :param model_responses: array of float of shape (N, k), responses of the LTFs
+        :return array of float of shape (N, k)
+        """
+        (N, k) = model_responses.shape
+
+        # prefix_products[:, l] = Prod_(i < l) < w_i x_i >, the last column holds the product of all responses
+        prefix_products = ones((N, k + 1), dtype=model_responses.dtype)
+        cumprod(model_responses, axis=1, out=prefix_products[:, 1:])
+
+        # suffix_products[:, l] = Prod_(i > l) < w_i x_i >
+        suffix_products = ones((N, k), dtype=model_responses.dtype)
+        cumprod(model_responses[:, :0:-1], axis=1, out=suffix_products[:, -2::-1])
+
+        leave_one_out_products = prefix_products[:, :-1]
+        leave_one_out_products *= suffix_products
+
+        products = prefix_products[:, -1]
+        scale = divide(combined_model_responses, products, out=ones(N, dtype=products.dtype),
+                       where=(combined_model_responses != products) & (products != 0))
+        leave_one_out_products *= scale[:, None]
+        return leave_one_out_products
+
+    @staticmethod
+    def combiner_gradient_ip_mod2(combined_model_responses, model_responses):
+        """
+        Caculates the gradient of the ip_mod2 combined responses with respect to the responses of all k LTFs.
+        The combined response is the product of the maxima of the responses of neighboring LTFs 2i and 2i+1. Hence,
+        the derivative with respect to an LTF's response is zero if the neighbor's response is the maximum, and the
+        product of the other maxima otherwise.
+        :param combined_model_responses: array of float of shape (N,), combined responses
+        :param model_responses: array of float of shape (N, k), responses of the LTFs
+        :return array of float of shape (N, k)
+        """
+        k = model_responses.shape[1]
+        # for even l, the max operation takes place with the next value, for odd l with the previous value
+        neighbors = model_responses[:, arange(k) ^ 1]
+        maxima = maximum(model_responses, neighbors)
+        return divide(
+            combined_model_responses[:, None],
+            maxima,
+            out=zeros(model_responses.shape, dtype=model_responses.dtype),
+            where=maxima != neighbors,
+        )
+
+    def prepare_challenges(self, sub_challenges=None):
+        """
+        Prepares the training set challenges for learning, i.e. transforms them, unless in streaming mode.
+        :param sub_challenges: None or array of shape (N, k, n)
+                               The already transformed training set challenges, which are then used as they are.
+        :return: None or the input transformation that still needs to be applied to each minibatch of challenges
+        """
+        if sub_challenges is not None:
+            assert len(sub_challenges) == self.training_set.N, 'Sub-challenges must match the training set.'
+            self.sub_challenges = sub_challenges
+            return None
+        if self.streaming:
+            # challenges are transformed block by block when computing the gradient
+            self.sub_challenges = self.training_set.challenges
+            return self.transformation
+        self.logger.debug(f'Transforming {len(self.training_set.challenges)} given {self.n}-bit '
+                          f'challenges using {self.transformation.__name__} for k={self.k} ...')
+        # the bias is handled by core_eval and gradient, hence no "efba" sub-challenges are needed
+        self.sub_challenges = self.sub_challenges_of(self.training_set.challenges, self.transformation, self.k)
+        return None
+
+    def epoch_minibatches(self, batch_slices, block_transformation):
+        """
+        Gives the minibatches for the current epoch, shuffled if requested.
+        :param batch_slices: list of slices of the (unshuffled) minibatches, see batch_slices
+        :param block_transformation: None or the input transformation that still needs to be applied to the
+                                     minibatches, see prepare_challenges
+        :return: generator of pairs of challenges and responses, and the input transformation that still needs to be
+                 applied when computing the gradient
+        """
+        batches = batch_slices
+        if self.shuffle and self.epoch_count > 1:
+            prng = RandomState(seed=self.epoch_count)
+            if self.streaming:
+                batches = [batch_slices[batch] for batch in prng.permutation(len(batch_slices))]
+            else:
+                # each minibatch is gathered into a copy, sorted indices keep the memory access in order
+                batches = [sort(batch) for batch in array_split(prng.permutation(self.training_set.N),
+                                                                len(batch_slices))]
+
+        minibatches = self.minibatches(self.sub_challenges, self.training_set.responses, batches,
+                                       block_transformation if self.prefetch else None)
+        if self.prefetch:
+            # minibatches of this epoch are gathered (and in streaming mode, transformed) in the background
+            return prefetched(minibatches, self.prefetch), None
+        return minibatches, block_transformation
+
+    def learn(self, init_weight_array=None, eta_minus=0.5, eta_plus=1.2, refresh_updater=True, sub_challenges=None):
         """
         Compute a model according to the given LTF Array parameters and training set.
         Note that this function can take long to return.
+        :param sub_challenges: None or array of shape (N, k, n)
+                               The already transformed training set challenges, e.g. shared by several runs on the
+                               same training set, see prepare_challenges.
         :return: pypuf.simulation.arbiter_based.LTFArray
                  The computed model.
         """
@@ -288,8 +527,8 @@ class LogisticRegression(Learner):
             """
             if self.logger is None:
                 return
-            if self.test_set:
-                self.test_set_dist = approx_dist_nonrandom(model, self.test_set)
+            if self.monitor:
+                self.test_set_dist = 1 - self.monitor.accuracy
             self.logger.debug(
                 '%i\t%s\t%f\t%f\t%f\t%s' % (
                     self.iteration_count,
@@ -305,73 +544,65 @@ class LogisticRegression(Learner):
         seterr(all='raise')
 
         # Prepare challenges
-        self.logger.debug(f'Transforming {len(self.training_set.challenges)} given {self.n}-bit '
-                          f'challenges using {self.transformation.__name__} for k={self.k} ...')
-        transformed_challenges = self.transformation(self.training_set.challenges, self.k)
-        if self.bias:
-            self.logger.debug(f'Efba\'ing {len(self.training_set.challenges)} given {self.n}-bit challenges')
-            self.efba_sub_challenges = LTFArray.efba_bit(transformed_challenges)
-        else:
-            self.logger.debug(f'Not efba\'ing {len(self.training_set.challenges)} challenges, assuming unbiased target')
-            self.efba_sub_challenges = transformed_challenges
+        block_transformation = self.prepare_challenges(sub_challenges)
+        if not self.bias:
+            self.logger.debug(f'Not learning bias for {len(self.training_set.challenges)} challenges, '
+                              f'assuming unbiased target')
 
         # we start with a random model
         self.logger.debug(f'Initializing random unbiased model')
-        model = LTFArray(
-            weight_array=LTFArray.normal_weights(self.n, self.k, self.weights_mu, self.weights_sigma,
-                                                 self.weights_prng),
-            transform=self.transformation,
-            combiner=self.combiner,
-            bias=0.0,
-        )
+        model = self.initial_model()
 
         if init_weight_array is not None:
-            model.weight_array = init_weight_array
+            model.weight_array = init_weight_array.astype(self.precision, copy=False)
 
         if refresh_updater:
-            self.updater = self.RPropModelUpdate(model, bias=self.bias, eta_minus=eta_minus, eta_plus=eta_plus)
+            self.updater = self.create_updater(model, eta_minus, eta_plus)
+        self.prepare_monitor()
+        if self.monitor:
+            self.monitor.reset(model)
         converged = False
+        stop = False
         self.iteration_count = 0
         log_state(0)
         number_of_batches = (self.training_set.N + 1) // self.minibatch_size
-        efba_challenge_batches = []
-        response_batches = []
-        if not self.shuffle:
-            efba_challenge_batches = array_split(self.efba_sub_challenges, number_of_batches)
-            response_batches = array_split(self.training_set.responses, number_of_batches)
+        # slices give views, hence memory-mapped challenges are not read here
+        batch_slices = self.batch_slices(self.training_set.N, number_of_batches)
 
         self.logger.debug(f'Starting learning loop!')
         self.logger.debug(f'stopping when step size smaller than {10**-self.convergence_decimals} or '
                           f'{self.iteration_limit} epochs')
-        while not converged and self.iteration_count < self.iteration_limit:
+        while not converged and not stop and self.iteration_count < self.iteration_limit:
             self.iteration_count += 1
             self.epoch_count += 1
-
-            if self.shuffle:
-                if self.epoch_count > 1:
-                    RandomState(seed=self.epoch_count).shuffle(self.efba_sub_challenges)
-                    RandomState(seed=self.epoch_count).shuffle(self.training_set.responses)
-                efba_challenge_batches = array_split(self.efba_sub_challenges, number_of_batches)
-                response_batches = array_split(self.training_set.responses, number_of_batches)
+            minibatches, gradient_transformation = self.epoch_minibatches(batch_slices, block_transformation)
 
             # compute gradient & update model
-            for batch in range(number_of_batches):
-                gradient = self.gradient(model, efba_challenge_batches[batch], response_batches[batch])
-                if self.bias:
-                    model.weight_array += self.updater.update(gradient)
-                else:
-                    model.weight_array[:, :-1] += self.updater.update(gradient)
-                self.gradient_step_count += 1
+            with closing(minibatches):
+                for challenges, responses in minibatches:
+                    gradient = self.gradient(model, challenges, responses, transformation=gradient_transformation)
+                    if self.bias:
+                        model.weight_array += self.updater.update(gradient)
+                    else:
+                        model.weight_array[:, :-1] += self.updater.update(gradient)
+                    self.gradient_step_count += 1
+
+                    # check convergence
+                    current_step_size = norm(self.updater.step)
+                    converged = current_step_size < 10**-self.convergence_decimals
+
+                    # check early stopping
+                    if self.monitor:
+                        stop = self.monitor.update(model)
 
-                # check convergence
-                current_step_size = norm(self.updater.step)
-                converged = current_step_size < 10**-self.convergence_decimals
+                    # log
+                    log_state(current_step_size)
 
-                # log
-                log_state(current_step_size)
+                    if converged or stop:
+                        break
 
-                if converged:
-                    break
+        if stop:
+            self.logger.debug(f'Stopped early: {self.monitor.stop_reason}')
 
         if not converged:
             self.converged = False
@@ -379,3 +610,229 @@ class LogisticRegression(Learner):
             self.converged = True
 
         return model
+
+    def initial_model(self):
+        """
+        Draws a random unbiased model from weights_prng.
+        :return: pypuf.simulation.arbiter_based.ltfarray.LTFArray
+        """
+        return LTFArray(
+            weight_array=LTFArray.normal_weights(self.n, self.k, self.weights_mu, self.weights_sigma,
+                                                 self.weights_prng).astype(self.precision),
+            transform=self.transformation,
+            combiner=self.combiner,
+            bias=0.0,
+        )
+
+    def create_updater(self, model, eta_minus, eta_plus):
+        """
+        Creates the model update for the given model, see model_update.
+        :param model: pypuf.simulation.arbiter_based.ltfarray.LTFArray
+        :param eta_minus: float, used for variants of RPropModelUpdate only
+        :param eta_plus: float, used for variants of RPropModelUpdate only
+        :return: LogisticRegression.ModelUpdate
+        """
+        if issubclass(self.model_update, self.RPropModelUpdate):
+            return self.model_update(model, bias=self.bias, eta_minus=eta_minus, eta_plus=eta_plus)
+        return self.model_update(model, bias=self.bias)
+
+    def prepare_monitor(self):
+        """
+        Creates the convergence monitor when a test set is given. The monitor is created again whenever the test set
+        or the monitoring parameters changed since it was created. The test set is only transformed again if the test
+        set, the transformation or k changed.
+        """
+        if not self.test_set:
+            self.monitor = None
+            self.monitor_parameters = None
+            return
+
+        test_set = (self.test_set, self.transformation, self.k)
+        parameters = (self.test_interval, self.test_time_interval, self.patience, self.target_accuracy)
+        if self.monitor and all(a is b for a, b in zip(self.monitor_parameters[0], test_set)):
+            if self.monitor_parameters[1] == parameters:
+                return
+            # keep the already transformed test set
+            test_set_transformed = ChallengeResponseSet(self.monitor.sub_challenges, self.monitor.responses)
+            self.monitor = self.ConvergenceMonitor(test_set_transformed, None, self.k, *parameters)
+        else:
+            self.logger.debug(f'Transforming {self.test_set.N} test set challenges ...')
+            self.monitor = self.ConvergenceMonitor(self.test_set, self.transformation, self.k, *parameters)
+        self.monitor_parameters = (test_set, parameters)
+
+    def batch_gradient_block_size(self, restarts, transformation=None):
+        """
+        Gives the number of challenges processed at once by batch_gradient, such that its temporary arrays fit into
+        max_memory. For each challenge, these are the sub-challenges in floating point (and in their own data type,
+        if they are transformed block by block) and BATCH_GRADIENT_MEMORY_FACTOR arrays with one value per model
+        and chain.
+        :param restarts: int number of models
+        :param transformation: None or input transformation, see gradient
+        :return: int
+        """
+        itemsize = self.precision.itemsize
+        bytes_per_challenge = self.k * self.n * itemsize + \
+            self.BATCH_GRADIENT_MEMORY_FACTOR * restarts * self.k * itemsize
+        if transformation is not None:
+            bytes_per_challenge += self.k * self.n
+        return max(1, self.max_memory // bytes_per_challenge)
+
+    def batch_gradient(self, weight_arrays, challenges, responses, block_size=None, transformation=None):
+        """
+        Compute the gradients of several models at once, see gradient.
+        :param weight_arrays: array of float of shape (R, k, n+1)
+                              Weights (including the bias weight) of R models.
+        :param challenges: list of challenges to work on
+        :param responses: list of responses to work on
+        :param block_size: None or int, the gradients will be computed in blocks of this size; defaults to the size
+                           given by max_memory, see batch_gradient_block_size
+        :param transformation: None or input transformation, see gradient
+        :return: array of float of shape (R, k, n+1), or (R, k, n) if the bias is not learned, and
+                 array of float of shape (R,), the ratio of training responses correctly predicted by each model
+        """
+        model_gradient = self.combiner_gradient(self.combiner)
+        R = len(weight_arrays)
+        block_size = block_size or self.batch_gradient_block_size(R, transformation)
+        result = zeros(shape=(R, self.k, self.n + 1 if self.bias else self.n), dtype=self.precision)
+        correct = zeros(R)
+        for start in range(0, len(challenges), block_size):
+            block_challenges = challenges[start:start+block_size]
+            if transformation is not None:
+                block_challenges = self.sub_challenges_of(block_challenges, transformation, self.k)
+            block_responses = responses[start:start+block_size]
+            N = len(block_responses)
+
+            # with the sub-challenges of each Arbiter chain in one contiguous floating point array, both contractions
+            # below are batched matrix products (one per Arbiter chain) over all models
+            block_challenges = ascontiguousarray(block_challenges.transpose(1, 0, 2), dtype=self.precision)
+
+            # compute model responses of all models, model_responses[r, i, l] is the response of the l-th LTF of
+            # the r-th model to the i-th challenge
+            model_responses = matmul(block_challenges, weight_arrays[:, :, :self.n].transpose(1, 2, 0))
+            model_responses = model_responses.transpose(2, 1, 0)
+            if self.bias:
+                model_responses += weight_arrays[:, None, :, self.n]
+            model_responses = model_responses.reshape(R * N, self.k)
+            combined_model_responses = self.combiner(model_responses)
+            combined_model_responses_sign = sign(combined_model_responses)
+            correct += count_nonzero(combined_model_responses_sign.reshape(R, N) == block_responses, axis=1)
+
+            # cap the absolute value of this to avoid overflow errors, see gradient
+            combined_model_responses = combined_model_responses_sign * minimum(50, np_abs(combined_model_responses))
+            sigmoid_derivative = .5 * (2 / (1 + exp(-combined_model_responses.reshape(R, N))) - 1 - block_responses)
+            gradient = sigmoid_derivative.reshape(R * N, 1) * model_gradient(combined_model_responses, model_responses)
+
+            # for each model r and Arbiter chain l, sum over all challenges, weighted by gradient[r, :, l]
+            gradient = gradient.reshape(R, N, self.k)
+            chain_gradient = ascontiguousarray(gradient.transpose(2, 0, 1))
+            result[:, :, :self.n] += matmul(chain_gradient, block_challenges).transpose(1, 0, 2)
+            if self.bias:
+                result[:, :, -1] += np_sum(gradient, axis=1)
+
+        return result, correct / len(responses)
+
+    def learn_restarts(self, restarts, eta_minus=0.5, eta_plus=1.2, init_weight_arrays=None, updaters=None,
+                       monitor=None, sub_challenges=None):
+        """
+        Learns several models at once on the same (transformed) training set. All models are updated with the same
+        minibatches, their gradients are computed together, see batch_gradient. A model drops out once it converged;
+        if a test set is given, it also drops out once it stops improving (see patience), and all models stop once
+        one of them reaches the target accuracy.
+        Each model and its statistics are given in self.restarts afterwards, the attributes of this learner (such as
+        converged and gradient_step_count) are set according to the returned model.
+        :param restarts: int number of models to learn
+        :param eta_minus: float, see RPropModelUpdate
+        :param eta_plus: float, see RPropModelUpdate
+        :param init_weight_arrays: None or array of float of shape (restarts, k, n+1)
+                                   Initial weights of the models, defaults to random models, see initial_model.
+        :param updaters: None or list of LogisticRegression.ModelUpdate
+                         Model update of each model, defaults to fresh ones, see create_updater.
+        :param monitor: None or LogisticRegression.ConvergenceMonitor
+                        Monitor copied for each model, defaults to the monitor of the test set.
+        :param sub_challenges: None or array of shape (N, k, n)
+                               The already transformed training set challenges, see prepare_challenges.
+        :return: pypuf.simulation.arbiter_based.LTFArray
+                 The model with the highest accuracy on the test set, or on the training set if no test set is given.
+        """
+        self.logger.debug(f'LR learner started with {restarts} restarts')
+        seterr(all='raise')
+        block_transformation = self.prepare_challenges(sub_challenges)
+        if monitor is None:
+            self.prepare_monitor()
+            monitor = self.monitor
+
+        # the weights of all models are kept in one array, each model works on a view
+        weight_arrays = zeros((restarts, self.k, self.n + 1), dtype=self.precision)
+        models = []
+        for restart in range(restarts):
+            model = self.initial_model()
+            weight_arrays[restart] = model.weight_array if init_weight_arrays is None else init_weight_arrays[restart]
+            model.weight_array = weight_arrays[restart]
+            models.append(model)
+        if updaters is None:
+            updaters = [self.create_updater(model, eta_minus, eta_plus) for model in models]
+        monitors = [copy(monitor) for _ in range(restarts)] if monitor else []
+        for restart_monitor, model in zip(monitors, models):
+            restart_monitor.reset(model)
+
+        converged = zeros(restarts, dtype=bool)
+        epoch_counts = zeros(restarts, dtype=int)
+        gradient_step_counts = zeros(restarts, dtype=int)
+        training_set_accuracies = zeros(restarts)
+        active = list(range(restarts))
+        success = False
+        number_of_batches = (self.training_set.N + 1) // self.minibatch_size
+        batch_slices = self.batch_slices(self.training_set.N, number_of_batches)
+        self.iteration_count = 0
+
+        while active and not success and self.iteration_count < self.iteration_limit:
+            self.iteration_count += 1
+            self.epoch_count += 1
+            epoch_counts[active] += 1
+            minibatches, gradient_transformation = self.epoch_minibatches(batch_slices, block_transformation)
+            with closing(minibatches):
+                for challenges, responses in minibatches:
+                    gradients, accuracies = self.batch_gradient(weight_arrays[active], challenges, responses,
+                                                                transformation=gradient_transformation)
+                    training_set_accuracies[active] = accuracies
+                    gradient_step_counts[active] += 1
+                    for restart, gradient in zip(list(active), gradients):
+                        if self.bias:
+                            weight_arrays[restart] += updaters[restart].update(gradient)
+                        else:
+                            weight_arrays[restart, :, :-1] += updaters[restart].update(gradient)
+                        converged[restart] = norm(updaters[restart].step) < 10**-self.convergence_decimals
+                        if monitors and monitors[restart].update(models[restart]):
+                            success = success or monitors[restart].stop_reason == 'target accuracy reached'
+                            active.remove(restart)
+                        elif converged[restart]:
+                            active.remove(restart)
+                    if not active or success:
+                        break
+            self.logger.debug(f'{self.iteration_count}\t{len(active)} of {restarts} restarts still active')
+
+        accuracies = [restart_monitor.accuracy for restart_monitor in monitors] if monitors else training_set_accuracies
+        self.restarts = [
+            self.Restart(
+                model=models[restart],
+                converged=bool(converged[restart]),
+                stop_reason=monitors[restart].stop_reason if monitors else None,
+                epoch_count=int(epoch_counts[restart]),
+                gradient_step_count=int(gradient_step_counts[restart]),
+                training_set_accuracy=float(training_set_accuracies[restart]),
+                test_set_accuracy=monitors[restart].accuracy if monitors else None,
+            )
+            for restart in range(restarts)
+        ]
+        best = max(range(restarts), key=lambda restart: accuracies[restart])
+        self.converged = self.restarts[best].converged
+        self.gradient_step_count = self.restarts[best].gradient_step_count
+        self.training_set_dist_sign = self.restarts[best].training_set_accuracy
+        if monitors:
+            self.test_set_dist = 1 - monitors[best].accuracy
+        self.updater = updaters[best]
+        return models[best]
+
+
+LogisticRegression.register_combiner_gradient(LTFArray.combiner_xor, LogisticRegression.combiner_gradient_xor)
+LogisticRegression.register_combiner_gradient(LTFArray.combiner_ip_mod2, LogisticRegression.combiner_gradient_ip_mod2)
@@ -0,0 +1,197 @@
+"""
+Model updates for the Logistic Regression learner, i.e. the algorithms deriving the step of the model's weights from
+the gradient, see pypuf.learner.regression.logistic_regression.LogisticRegression.
+"""
+from numpy import zeros, full, empty, sign, multiply, greater, less, clip, negative, copyto, sqrt, divide
+
+
+class ModelUpdate(object):
+    """
+    Model update according to the naive algorithm. Works, but is really slow to converge.
+    """
+
+    def __init__(self, model):
+        """
+        :param model: pypuf.simulation.arbiter_based.ltfarray.LTFArray
+                      Model which is used to model a PUF.
+        """
+        self.model = model
+
+    def update(self, gradient):
+        """
+        Use the gradient scaled with a constant to determine the update step.
+        :param gradient: array of float
+        :return: array of float
+        """
+        return -.3 * gradient
+
+
+class RPropModelUpdate(ModelUpdate):
+    """
+    Model update according to the Resilient Backpropagation algorithm. For details, see update() method.
+    """
+
+    def __init__(self, model, bias=False, eta_minus=0.5, eta_plus=1.2):
+        """
+        The state of the update is kept in the precision of the model's weights.
+        :param model: pypuf.simulation.arbiter_based.ltfarray.LTFArray
+        :param eta_minus: float
+        :param eta_plus: float
+        """
+        self.n = n = model.n
+        self.k = k = model.k
+        precision = model.weight_array.dtype
+
+        self.eta_minus = eta_minus
+        self.eta_plus = eta_plus
+        self.delta_min = 10 ** -4
+        self.delta_max = 10 ** +1
+        self.last_gradient = full((k, n + 1 if bias else n), 1.0, precision)
+        self.last_step_size = full((k, n + 1 if bias else n), 0.0, precision)
+        self.step_size = full((k, n + 1 if bias else n), 1.0, precision)
+        self.step = full((k, n + 1 if bias else n), 0.0, precision)
+        self.step_size_max = full(self.n + 1 if bias else n, self.delta_max, precision)
+        self.step_size_min = full(self.n + 1 if bias else n, self.delta_min, precision)
+
+        # buffers for the update of all chains at once
+        self.step_indicator = empty((k, n + 1 if bias else n), precision)
+        self.increase = empty((k, n + 1 if bias else n), bool)
+        self.decrease = empty((k, n + 1 if bias else n), bool)
+
+        super().__init__(model)
+
+    def adapt_step_size(self, gradient):
+        """
+        Increases the step size of all weights whose partial derivative kept its sign and decreases the step size
+        of all weights whose partial derivative changed its sign, respecting step_size_min and step_size_max.
+        :param gradient: array of float
+        :return: array of bool, True for all weights whose partial derivative changed its sign
+        """
+        step_indicator = multiply(gradient, self.last_gradient, out=self.step_indicator)
+        sign(step_indicator, out=step_indicator)
+        greater(step_indicator, 0, out=self.increase)
+        less(step_indicator, 0, out=self.decrease)
+        multiply(self.step_size, self.eta_plus, out=self.step_size, where=self.increase)
+        multiply(self.step_size, self.eta_minus, out=self.step_size, where=self.decrease)
+        clip(self.step_size, self.step_size_min, self.step_size_max, out=self.step_size)
+        return self.decrease
+
+    def sign_step(self, gradient):
+        """
+        Sets the step to the current step size against the direction of the gradient.
+        :param gradient: array of float
+        """
+        negative(multiply(sign(gradient, out=self.step), self.step_size, out=self.step), out=self.step)
+
+    def remember(self, gradient, decrease):
+        """
+        Keeps gradient and step for the next update; partial derivatives that changed their sign are forgotten,
+        such that the step size of the corresponding weights is not adapted in the next update.
+        :param gradient: array of float
+        :param decrease: array of bool, see adapt_step_size
+        """
+        copyto(self.last_gradient, gradient)
+        copyto(self.last_gradient, 0, where=decrease)
+        copyto(self.last_step_size, self.step)
+
+    def update(self, gradient):
+        """
+        Compute update step according to "Resilient Backpropagation" by
+        Riedmiller, Martin, and Heinrich Braun. "A direct adaptive method for faster backpropagation learning:
+        The RPROP algorithm."
+        Neural Networks, 1993., IEEE International Conference on. IEEE, 1993.
+
+        Implementation following the neat implementation used in
+        Rührmair, Ulrich, et al. "Modeling attacks on physical unclonable functions."
+        Proceedings of the 17th ACM conference on Computer and communications security.
+        ACM, 2010.
+
+        For their original code, please see http://www.pcp.in.tum.de/code/lr.zip,
+        predictor.py:299
+        The update is computed for all chains at once, in place of the preallocated state.
+        :param gradient array of float
+        :return: array of float
+        """
+        decrease = self.adapt_step_size(gradient)
+        self.sign_step(gradient)
+        # where the partial derivative changed its sign, the last step is reverted
+        negative(self.last_step_size, out=self.step, where=decrease)
+        self.remember(gradient, decrease)
+        return self.step
+
+
+class IRPropMinusModelUpdate(RPropModelUpdate):
+    """
+    Model update according to the iRprop- variant of Resilient Backpropagation, see update() method.
+    """
+
+    def update(self, gradient):
+        """
+        Compute update step according to "iRprop-" by
+        Igel, Christian, and Michael Hüsken. "Improving the Rprop learning algorithm."
+        Proceedings of the Second International ICSC Symposium on Neural Computation, 2000.
+        Unlike RPropModelUpdate, no steps are reverted; where the partial derivative changed its sign, the weight is
+        not changed.
+        :param gradient array of float
+        :return: array of float
+        """
+        decrease = self.adapt_step_size(gradient)
+        self.sign_step(gradient)
+        copyto(self.step, 0, where=decrease)
+        self.remember(gradient, decrease)
+        return self.step
+
+
+class AdamModelUpdate(ModelUpdate):
+    """
+    Model update according to the Adam algorithm, see update() method.
+    """
+
+    def __init__(self, model, bias=False, learning_rate=.1, beta_1=.9, beta_2=.999, epsilon=10 ** -8):
+        """
+        The state of the update is kept in the precision of the model's weights.
+        Note that Adam's steps only become small where the partial derivatives keep changing their sign, hence the
+        learner may not converge according to its convergence_decimals but run until its iteration_limit, unless
+        stopped early (see ConvergenceMonitor).
+        :param model: pypuf.simulation.arbiter_based.ltfarray.LTFArray
+        :param learning_rate: float
+        :param beta_1: float, decay of the first moment estimate
+        :param beta_2: float, decay of the second moment estimate
+        :param epsilon: float
+        """
+        self.n = n = model.n
+        self.k = k = model.k
+        precision = model.weight_array.dtype
+
+        self.learning_rate = learning_rate
+        self.beta_1 = beta_1
+        self.beta_2 = beta_2
+        self.epsilon = epsilon
+        self.t = 0
+        self.first_moment = zeros((k, n + 1 if bias else n), precision)
+        self.second_moment = zeros((k, n + 1 if bias else n), precision)
+        self.step = zeros((k, n + 1 if bias else n), precision)
+        self.denominator = empty((k, n + 1 if bias else n), precision)
+
+        super().__init__(model)
+
+    def update(self, gradient):
+        """
+        Compute update step according to "Adam" by
+        Kingma, Diederik P., and Jimmy Ba. "Adam: A method for stochastic optimization."
+        International Conference on Learning Representations, 2015.
+        :param gradient array of float
+        :return: array of float
+        """
+        self.t += 1
+        self.first_moment *= self.beta_1
+        self.first_moment += (1 - self.beta_1) * gradient
+        self.second_moment *= self.beta_2
+        self.second_moment += (1 - self.beta_2) * gradient ** 2
+
+        # step = -learning_rate * first_moment_corrected / (sqrt(second_moment_corrected) + epsilon)
+        sqrt(self.second_moment / (1 - self.beta_2 ** self.t), out=self.denominator)
+        self.denominator += self.epsilon
+        divide(self.first_moment, self.denominator, out=self.step)
+        self.step *= -self.learning_rate / (1 - self.beta_1 ** self.t)
+        return self.step
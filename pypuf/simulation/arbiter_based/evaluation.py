@@ -0,0 +1,416 @@
+"""
+This module provides the machinery LTFArray uses to evaluate challenges efficiently: input transformations compiled
+together with their constant tables, the evaluation of bit-packed challenges, and the evaluation in chunks.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from numpy import array, arange, empty, empty_like, zeros, einsum, take, uint8
+from numpy import sum as np_sum
+from numpy.random import RandomState
+
+from pypuf import tools
+
+
+class TransformPlan:
+    """
+    An input transformation compiled for fixed challenge length n and number of LTFs k.
+    Compiling computes all constant tables the transformation needs (such as shift and permutation indices or
+    irreducible polynomials) once. Calling the plan then only runs the transformation's kernel with these tables.
+    Plans are cached, use TransformPlan.compile to obtain them.
+    """
+
+    # Maximum number of plans kept in the cache of TransformPlan.compile.
+    CACHE_SIZE = 256
+
+    # Input transformations registered with TransformPlan.register, by name: tuples of the transformation itself,
+    # the function computing its tables and its bit-packed implementation.
+    TRANSFORMATIONS = {}
+
+    def __init__(self, transform, n, k, tables=None, packed_kernel=None):
+        """
+        :param transform: A function: array of int with shape(N,n), int number of PUFs k -> shape(N,k,n)
+                          The input transformation. It must accept the given tables as keyword arguments.
+        :param n: int
+                  Challenge length
+        :param k: int
+                  Number of LTFs
+        :param tables: dict or None
+                       Keyword arguments passed to transform on each call.
+        :param packed_kernel: None or a function: pypuf.tools.PackedChallenges -> pypuf.tools.PackedChallenges
+                              Implementation of the transformation working on bit-packed challenges, see
+                              PackedEvaluationMixin.packed_transform.
+        """
+        self.transform = transform
+        self.n = n
+        self.k = k
+        self.tables = tables or {}
+        self.packed_kernel = packed_kernel
+        self.__name__ = getattr(transform, '__name__', repr(transform))
+
+    def __call__(self, challenges):
+        """
+        Transforms the given challenges.
+        :param challenges: array of shape(N,n)
+                           Array of challenges which should be evaluated by the simulation.
+        :return: array of shape(N,k,n)
+                 Array of transformed challenges.
+        """
+        assert challenges.shape[1] == self.n, \
+            'Transform plan compiled for n={} was called with challenges of length {}.'.format(
+                self.n, challenges.shape[1])
+        return self.transform(challenges, self.k, **self.tables)
+
+    @staticmethod
+    def register(transform, tables=None, packed_kernel=None):
+        """
+        Registers the constant tables and the bit-packed implementation of an input transformation, which are then
+        used by all plans compiled for this transformation.
+        :param transform: A function: array of int with shape(N,n), int number of PUFs k -> shape(N,k,n)
+                          The input transformation.
+        :param tables: None or a function: int n, int k -> dict
+                       Computes the keyword arguments of transform holding the tables.
+        :param packed_kernel: None or a function: pypuf.tools.PackedChallenges -> pypuf.tools.PackedChallenges
+                              Implementation of the transformation working on bit-packed challenges.
+        """
+        TransformPlan.TRANSFORMATIONS[transform.__name__] = (transform, tables, packed_kernel)
+        TransformPlan.compile.cache_clear()
+
+    @staticmethod
+    @lru_cache(maxsize=CACHE_SIZE)
+    def compile(transform, n, k):
+        """
+        Returns the plan of the given input transformation for challenge length n and k LTFs. Results are cached
+        (least recently used plans are dropped first), hence repeated calls, e.g. on each evaluation of an LTFArray,
+        do not pay the set up cost again.
+        The cache is keyed by the transformation itself rather than its name, as generated transformations with
+        equal names may differ, e.g. in the permutations used.
+        :param transform: A function: array of int with shape(N,n), int number of PUFs k -> shape(N,k,n)
+        :param n: int
+                  Challenge length
+        :param k: int
+                  Number of LTFs
+        :return: TransformPlan
+        """
+        name = getattr(transform, '__name__', None)
+        if name not in TransformPlan.TRANSFORMATIONS:
+            return TransformPlan(transform, n, k)
+        (registered_transform, tables, packed_kernel) = TransformPlan.TRANSFORMATIONS[name]
+        if not tools.compare_functions(transform, registered_transform):
+            return TransformPlan(transform, n, k)
+        return TransformPlan(transform, n, k, tables=tables(n, k) if tables else None, packed_kernel=packed_kernel)
+
+
+class TransformTablesMixin:
+    """
+    Constant tables used by the input transformations of LTFArray, see TransformPlan.
+    """
+
+    # Irreducible polynomials f used by transform_polynomial, bit i is the coefficient of x^i.
+    IRREDUCIBLE_POLYNOMIALS = {
+        8: 0x14d,
+        16: 0x150d7,
+        24: 0x1b00001,
+        32: 0x162000001,
+        48: 0x1696800016969,
+        64: 0x1b000000000000001,
+    }
+
+    # Seeds of the permutations used by transform_fixed_permutation.
+    # For performance reasons, we do not call _find_fixed_permutations in transform_fixed_permutation.
+    FIXED_PERMUTATION_SEEDS = {
+        64: [2989, 2992, 3038, 3084, 3457, 6200, 7089, 18369, 21540, 44106],
+        128: [2989, 3006, 3009, 3031, 3437, 4174, 6045, 7906, 11554, 29544],
+    }
+
+    @classmethod
+    def lightweight_secure_indices(cls, n, k):
+        """
+        Returns the index table used by transform_lightweight_secure. For the challenge c shifted by l bits, the
+        sub-challenge before ATT is (c_0 c_1, c_2 c_3, ..., c_(n-2) c_(n-1), c_0, c_1 c_2, ..., c_(n-3) c_(n-2)).
+        The table holds the positions of these values in the array of all products c_i c_(i+1 mod n), i = 0..n-1,
+        followed by c_0, ..., c_(n-1).
+        :param n: int
+                  Challenge length
+        :param k: int
+                  Number of LTFArray PUFs
+        :return: array of int of shape (k, n)
+        """
+        n_half = n // 2
+        indices = empty((k, n), dtype=int)
+        for j in range(k):
+            shift = j if j <= n else 0
+            indices[j, :n_half] = (arange(0, n, 2) + shift) % n
+            indices[j, n_half] = n + shift % n
+            indices[j, n_half + 1:] = (arange(1, n - 2, 2) + shift) % n
+        return indices
+
+    @classmethod
+    def shift_indices(cls, n, k):
+        """
+        Returns the index table used by transform_shift: the l-th LTF receives the challenge rotated by l bits to the
+        left (or the original challenge, if l > n).
+        :param n: int
+                  Challenge length
+        :param k: int
+                  Number of LTFArray PUFs
+        :return: array of int of shape (k, n)
+        """
+        return array([(arange(n) + (shift if shift <= n else 0)) % n for shift in range(k)])
+
+    @classmethod
+    def irreducible_polynomial(cls, n):
+        """
+        Returns the irreducible polynomial of degree n used by transform_polynomial.
+        :param n: int
+                  Challenge length
+        :return: int, bit i is the coefficient of x^i
+        """
+        assert n in cls.IRREDUCIBLE_POLYNOMIALS, 'Polynomial transformation is only implemented for challenges ' \
+                                                 'with n in {8, 16, 24, 32, 48, 64}.'
+        return cls.IRREDUCIBLE_POLYNOMIALS[n]
+
+    @classmethod
+    def permutation_atf_indices(cls, n, k):
+        """
+        Returns the permutations used by transform_permutation_atf, the l-th LTF uses the permutation given by
+        RandomState(0x1234 + l).
+        :param n: int
+                  Challenge length
+        :param k: int
+                  Number of LTFArray PUFs
+        :return: array of int of shape (k, n)
+        """
+        seed = 0x1234
+        return tools.permutation_table(tuple(seed + i for i in range(k)), n)
+
+    @classmethod
+    def fixed_permutation_indices(cls, n, k):
+        """
+        Returns the permutations used by transform_fixed_permutation.
+        :param n: int
+                  Challenge length
+        :param k: int
+                  Number of LTFArray PUFs
+        :return: array of int of shape (k, n)
+        """
+        # check parameter n
+        assert n in cls.FIXED_PERMUTATION_SEEDS.keys(), 'Fixed permutation currently not supported for n=%i, but ' \
+                                                        'only for n in %s. To add support, please use ' \
+                                                        'LTFArray._find_fixed_permutations(n, k).' % \
+                                                        (n, cls.FIXED_PERMUTATION_SEEDS.keys())
+
+        # check parameter k
+        seeds = cls.FIXED_PERMUTATION_SEEDS[n]
+        assert k <= len(seeds), 'Fixed permutation for n=%i currently only supports k<=%i.' % (n, len(seeds))
+
+        return tools.permutation_table(tuple(seeds[:k]), n)
+
+    @classmethod
+    def _find_fixed_permutations(cls, n, k):
+        """
+        Finds permutations suitable to use in LTFArray.transform_fixed_permutation.
+
+        Permutations are chosen such that no permutation has a fix point and no
+        two permutations share at least one point. (See `permutation_okay` below.)
+
+        Note that the run time of this method increases drastically with k. On an
+        Intel i7, n=64, k=10 takes a couple of seconds.
+
+        :return: list of seeds for `RandomState`. Obtain the permutation with
+          `RandomState(seed).permutation(n)`.
+        """
+        def permutation_okay(new_p, ps):
+            # 1. check that p has no fix point
+            if any([i == new_p[i] for i in range(len(new_p))]):
+                return False
+
+            # 2. check that it does not share a point if any old_p in ps:
+            if any([
+                    any([old_p[i] == new_p[i] for i in range(len(new_p))])
+                    for old_p in ps
+            ]):
+                return False
+
+            return True
+
+        seed = 0xbad
+        permutation_seeds = []
+        permutations = []
+
+        while len(permutations) < k:
+            prng = RandomState(seed)
+            p = prng.permutation(n)
+            if permutation_okay(p, permutations):
+                permutation_seeds.append(seed)
+                permutations.append(p)
+            seed += 1
+
+        return permutation_seeds
+
+
+class PackedEvaluationMixin:
+    """
+    Evaluation of LTFArrays on bit-packed challenges, for input transformations registered with a bit-packed
+    implementation, see TransformPlan.register.
+    """
+
+    def ltf_eval_challenges(self, challenges):
+        """
+        Transforms the given (master) challenges and evaluates the sub-challenges with ltf_eval, or, if the
+        challenges are packed and the transformation can be applied on packed challenges, with ltf_eval_packed.
+        :param challenges: array of shape(N,n) or pypuf.tools.PackedChallenges
+                           Array of challenges which should be evaluated by the simulation.
+        :return: array of float with shape(N,k)
+                 Responses of each of the k LTFs to the N challenges.
+        """
+        if isinstance(challenges, tools.PackedChallenges):
+            packed_transform = self.packed_transform()
+            if packed_transform:
+                return self.ltf_eval_packed(packed_transform(challenges))
+            challenges = challenges.unpack()
+        return self.ltf_eval(self.compiled_transform()(challenges))
+
+    def packed_transform(self):
+        """
+        Returns the implementation of this LTFArray's input transformation that works on bit-packed challenges, if
+        there is one. Currently, this is the case for transform_id and transform_atf. These transformations give the
+        same sub-challenge to all k LTFs, hence the packed implementation gives just one packed feature vector per
+        challenge.
+        :return: A function: pypuf.tools.PackedChallenges -> pypuf.tools.PackedChallenges, or None
+        """
+        return self.compiled_transform().packed_kernel
+
+    @classmethod
+    def packed_transform_id(cls, challenges):
+        """
+        Bit-packed version of transform_id.
+        :param challenges: pypuf.tools.PackedChallenges
+        :return: pypuf.tools.PackedChallenges, the feature vector shared by all LTFs
+        """
+        return challenges
+
+    @classmethod
+    def packed_transform_atf(cls, challenges):
+        """
+        Bit-packed version of transform_atf. The ATF features are the suffix parities of the challenge.
+        :param challenges: pypuf.tools.PackedChallenges
+        :return: pypuf.tools.PackedChallenges, the feature vector shared by all LTFs
+        """
+        return challenges.suffix_parity()
+
+    def ltf_eval_packed(self, features):
+        """
+        Evaluates all k LTFs on the given bit-packed feature vectors, which are shared by all LTFs, without
+        unpacking them. As a set bit represents -1, the response of the l-th LTF is
+        sum_i w_li - 2 * sum_(i: bit i set) w_li + bias_l.
+        The second sum is computed byte-wise using a lookup table holding the partial weight sums for all 256
+        values of each byte.
+        :param features: pypuf.tools.PackedChallenges
+                         Feature vectors, e.g. as given by packed_transform_atf.
+        :return: array of float shape(N,k)
+                 Array of responses for the N different challenges.
+        """
+        assert features.n == self.n, \
+            'Packed features given to ltf_eval_packed had length {}, but n={} was expected.'.format(features.n, self.n)
+        octets = features.words.astype('<u8').view(uint8)
+        byte_count = octets.shape[1]
+
+        # table[b, v, l] = twice the sum of weights of LTF l for the bits set in value v of byte b
+        weights = zeros((self.k, byte_count * 8), dtype=self.weight_array.dtype)
+        weights[:, :self.n] = 2 * self.weight_array[:, :-1]
+        byte_bits = (arange(256)[:, None] >> arange(8)) & 1
+        table = einsum('lbt,vt->bvl', weights.reshape((self.k, byte_count, 8)), byte_bits)
+
+        responses = empty((len(octets), self.k), dtype=self.weight_array.dtype)
+        responses[:] = np_sum(self.weight_array, axis=1)
+        partial_sums = empty_like(responses)
+        for b in range(byte_count):
+            take(table[b], octets[:, b], axis=0, out=partial_sums)
+            responses -= partial_sums
+        return responses
+
+
+class ChunkedEvaluationMixin:
+    """
+    Evaluation of LTFArrays in chunks of challenges, optionally using several worker threads.
+    """
+
+    # Approximate number of bytes needed per sub-challenge bit when evaluating the LTFArray, as input transformations
+    # and the evaluation allocate a few temporary copies of the sub-challenges. Used to translate max_memory into
+    # chunk_size.
+    EVAL_MEMORY_FACTOR = 4
+
+    # Smallest chunk size used when evaluating with several worker threads and no chunk_size is given; fewer
+    # challenges are not worth the overhead of an additional thread.
+    MIN_WORKER_CHUNK_SIZE = 2 ** 14
+
+    def val(self, challenges):
+        """
+        Evaluates a given array of (master) challenges and returns the precise value of the combined LTFs responses.
+        That is, the master challenges are first transformed into sub-challenges, using this LTFArray's transformation
+        method. The challenges are then evaluated using ltf_eval. The responses are then combined using this LTFArray's
+        combiner.
+        If this LTFArray has a chunk_size and more challenges are given, the evaluation is done chunk by chunk, see
+        val_chunked. If this LTFArray has more than one worker, chunks are evaluated concurrently; without chunk_size,
+        the challenges are then split evenly among the workers (but into chunks of at least MIN_WORKER_CHUNK_SIZE).
+        :param challenges: array of shape(N,n) or pypuf.tools.PackedChallenges
+                       Array of challenges which should be evaluated by the simulation.
+        :return: array of float or int depending on the combiner of shape (N,)
+                 Array of responses for the N different challenges.
+        """
+        N = len(challenges)
+        chunk_size = self.chunk_size
+        if self.workers and self.workers > 1 and not chunk_size:
+            chunk_size = max(-(-N // self.workers), self.MIN_WORKER_CHUNK_SIZE)
+        if chunk_size and N > chunk_size:
+            return self.val_chunked(challenges, chunk_size, self.workers)
+        return self.val_chunk(challenges)
+
+    def val_chunked(self, challenges, chunk_size, workers=None):
+        """
+        Evaluates the given challenges like val, but runs input transformation, LTF evaluation and combiner on
+        chunks of at most chunk_size challenges at a time, writing the results into a preallocated output array.
+        The memory used hence does not grow with the number of challenges (besides the output itself).
+        If more than one worker is given, the chunks are evaluated by a pool of threads; at most one chunk per worker
+        is evaluated at a time.
+        Note that noisy simulations draw their noise chunk by chunk, which may change the noise assigned to each
+        challenge compared to an evaluation in one piece. With several workers, the order in which chunks draw their
+        noise is not deterministic.
+        :param challenges: array of shape(N,n) or pypuf.tools.PackedChallenges
+                           Array of challenges which should be evaluated by the simulation.
+        :param chunk_size: int
+                           Maximum number of challenges evaluated at once.
+        :param workers: None or int
+                        Number of threads used for evaluation.
+        :return: array of float or int depending on the combiner of shape (N,)
+                 Array of responses for the N different challenges.
+        """
+        N = len(challenges)
+        starts = range(0, N, chunk_size)
+
+        def evaluate(start):
+            return self.val_chunk(challenges[start:start + chunk_size])
+
+        if workers and workers > 1 and len(starts) > 1:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                return self._collect_chunks(N, starts, pool.map(evaluate, starts))
+        return self._collect_chunks(N, starts, map(evaluate, starts))
+
+    @staticmethod
+    def _collect_chunks(N, starts, chunk_responses_iterator):
+        """
+        Writes the responses of the given chunks into a preallocated output array.
+        :param N: int
+                  Total number of challenges
+        :param starts: list of int
+                       Index of the first challenge of each chunk
+        :param chunk_responses_iterator: iterator over the responses of the chunks, in order
+        :return: array of float or int of shape (N,)
+        """
+        responses = None
+        for start, chunk_responses in zip(starts, chunk_responses_iterator):
+            if responses is None:
+                responses = empty((N,) + chunk_responses.shape[1:], dtype=chunk_responses.dtype)
+            responses[start:start + len(chunk_responses)] = chunk_responses
+        return responses
@@ -2,11 +2,14 @@
 This module provides several different implementations of arbiter PUF simulations. The linear threshold function array
 model is the core of each simulation class.
 """
-from numpy import prod, shape, sign, array, transpose, concatenate, swapaxes, sqrt, amax, append
-from numpy import sum as np_sum, ones, ndarray, zeros, reshape, broadcast_to, einsum
+from numpy import prod, shape, sign, array, transpose, concatenate, sqrt, amax, append
+from numpy import sum as np_sum, ones, ndarray, zeros, reshape, broadcast_to, einsum, arange, empty, take, \
+    multiply, issubdtype, floating
 from numpy.random import RandomState
 
 from pypuf import tools
+from pypuf.simulation.arbiter_based.evaluation import TransformPlan, TransformTablesMixin, PackedEvaluationMixin, \
+    ChunkedEvaluationMixin
 from pypuf.simulation.base import Simulation
 
 
@@ -34,20 +37,22 @@ class CompoundTransformation:
         """
         return self.generator(*self.args)
 
-    def __call__(self, *args, **kwargs):
+    def __call__(self, challenges, k):
         """
         If called directly, we build and cache the compound transformation. Hence, this class
         behaves transparent if treated directly as input transformation with few overhead.
+        The transformation is run through its TransformPlan.
         """
         if not self._transform:
             self._transform = self.build()
-        return self._transform(*args, **kwargs)
+        (_, n) = challenges.shape
+        return TransformPlan.compile(self._transform, n, k)(challenges)
 
     def __repr__(self):
         return self.build().__name__
 
 
-class LTFArray(Simulation):
+class LTFArray(ChunkedEvaluationMixin, PackedEvaluationMixin, TransformTablesMixin, Simulation):
     """
     Class that simulates k LTFs with n bits and a constant term each
     and constant bias added.
@@ -122,20 +127,57 @@ class LTFArray(Simulation):
         return res
 
     @classmethod
-    def transform_lightweight_secure(cls, challenges, k):
+    def transform_lightweight_secure(cls, challenges, k, indices=None):
         """
         Input transform as defined by Majzoobi et al. 2008.
+        All bits of the shifted and pairwise multiplied challenges are products of two neighbouring challenge bits or
+        a single challenge bit. Hence, these products are computed once per challenge, and the sub-challenges are
+        gathered from them in one step using a precomputed index table, before the ATT is applied in place.
+        To make gather and ATT work on contiguous memory, the sub-challenges are stored bit position major, i.e. the
+        result is a transposed view of an array of shape (k, n, N).
         :param challenges: array of shape(N,n)
                            Array of challenges which should be evaluated by the simulation.
         :param k: int
                   Number of LTFArray PUFs
+        :param indices: None or array of int of shape (k, n)
+                        Precomputed LTFArray.lightweight_secure_indices(n, k), see TransformPlan.
         :return:  array of shape(N,k,n)
                   Array of transformed challenges.
         """
         (N, n) = challenges.shape
         assert n % 2 == 0, 'Secure Lightweight Input Transformation only defined for even n.'
 
-        sub_challenges = cls.transform_shift(challenges, k)
+        if indices is None:
+            indices = cls.lightweight_secure_indices(n, k)
+
+        # products of (cyclically) neighbouring challenge bits, followed by the challenge bits themselves
+        products = empty((2 * n, N), dtype=challenges.dtype)
+        multiply(challenges[:, :-1].T, challenges[:, 1:].T, out=products[:n - 1])
+        multiply(challenges[:, -1], challenges[:, 0], out=products[n - 1])
+        products[n:] = challenges.T
+
+        result = cls.att(transpose(take(products, indices, axis=0), (2, 0, 1)))
+
+        assert result.shape == (N, k, n), 'The resulting challenges do not have the desired shape.'
+        return result
+
+    @classmethod
+    def transform_lightweight_secure_legacy(cls, challenges, k):
+        """
+        Input transform as defined by Majzoobi et al. 2008.
+        This is the straightforward implementation building the shifted challenges and pairwise products one by
+        one. It gives the same result as transform_lightweight_secure and is kept for reference and benchmarking.
+        :param challenges: array of shape(N,n)
+                           Array of challenges which should be evaluated by the simulation.
+        :param k: int
+                  Number of LTFArray PUFs
+        :return:  array of shape(N,k,n)
+                  Array of transformed challenges.
+        """
+        (N, n) = challenges.shape
+        assert n % 2 == 0, 'Secure Lightweight Input Transformation only defined for even n.'
+
+        sub_challenges = TransformPlan.compile(cls.transform_shift, n, k)(challenges)
 
         sub_challenges = transpose(
             concatenate(
@@ -180,45 +222,50 @@ class LTFArray(Simulation):
         )
 
         assert challenges.shape == (N, n)
-        res = cls.transform_shift(challenges, k)
+        res = TransformPlan.compile(cls.transform_shift, n, k)(challenges)
         return res
 
     @classmethod
-    def transform_shift(cls, challenges, k):
+    def transform_shift(cls, challenges, k, indices=None):
         """
         Input transformation that shifts the input bits for each of the k PUFs.
         :param challenges: array of shape(N,n)
                            Array of challenges which should be evaluated by the simulation.
         :param k: int
                   Number of LTFArray PUFs
+        :param indices: None or array of int of shape (k, n)
+                        Precomputed LTFArray.shift_indices(n, k), see TransformPlan.
         :return:  array of shape(N,k,n)
                   Array of transformed challenges.
         """
         N = len(challenges)
         n = len(challenges[0])
 
-        result = swapaxes(array([
-            concatenate((challenges[:, l:], challenges[:, :l]), axis=1)
-            for l in range(k)
-        ]), 0, 1)
+        if indices is None:
+            indices = cls.shift_indices(n, k)
+        result = cls.permute(challenges, indices)
 
         assert result.shape == (N, k, n)
         return result
 
     @classmethod
-    def transform_polynomial(cls, challenges, k):
+    def transform_polynomial(cls, challenges, k, irreducible_polynomial=None):
         """
         This input transformation interprets a challenge c as a
         polynomial over the finite field GF(2^n)=F2/f*F2, where f is a
         irreducible polynomial of degree n.
         The irreducible polynomial f is hard coded and
         of degree 8, 16, 24, 32, 48, or 64.
-        Each Arbiter Chain i receives as input the polynomial c^i
+        Each Arbiter Chain i = 1, ..., k receives as input the polynomial c^(i+1)
         as element of GF(2^n).
+        The powers are computed for all challenges at once using carry-less arithmetic on bit-packed challenges,
+        see pypuf.tools.gf2n_mult.
         :param challenges: array of shape(N,n)
                            Array of challenges which should be evaluated by the simulation.
         :param k: int
                   Number of LTFArray PUFs
+        :param irreducible_polynomial: None or int
+                                       Precomputed LTFArray.irreducible_polynomial(n), see TransformPlan.
         :return:  array of shape(N,k,n)
                   Array of transformed challenges.
         """
@@ -226,49 +273,18 @@ class LTFArray(Simulation):
         N = len(challenges)
         n = len(challenges[0])
 
-        if n == 64:
-            irreducible_polynomial = array(
-                [1, 1, 0, 1, 1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0,
-                 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
-                dtype=dtype
-            )
-        elif n == 48:
-            irreducible_polynomial = array(
-                [1, 0, 1, 1, 0, 1, 0, 0, 1, 0, 1, 1, 0, 1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1, 0,
-                 1, 1, 0, 1, 0, 0, 1, 0, 1, 1, 0, 1, 0, 0, 1], dtype=dtype
-            )
-        elif n == 32:
-            irreducible_polynomial = array(
-                [1, 0, 1, 1, 0, 0, 0, 1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
-                dtype=dtype
-            )
-        elif n == 24:
-            irreducible_polynomial = array([1, 1, 0, 1, 1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
-                                           dtype=dtype)
-        elif n == 16:
-            irreducible_polynomial = array([1, 0, 1, 0, 1, 0, 0, 0, 0, 1, 1, 0, 1, 0, 1, 1, 1], dtype=dtype)
-        elif n == 8:
-            irreducible_polynomial = array([1, 0, 1, 0, 0, 1, 1, 0, 1], dtype=dtype)
-        else:
-            raise AssertionError('Polynomial transformation is only implemented for challenges with n in '
-                                 '{8, 16, 24, 32, 48, 64}.')
-
-        # Transform challenge to 0,1 array to compute transformation with numpy.
-        cs_01 = array([tools.transform_challenge_11_to_01(c) for c in challenges])
+        if irreducible_polynomial is None:
+            irreducible_polynomial = cls.irreducible_polynomial(n)
 
-        # Compute c^i for each challenge for i from 1 to k.
-        challenges = concatenate([
-            [tools.poly_mult_div(c, irreducible_polynomial, k) for c in cs_01]
-        ])
-
-        # Transform challenges back to -1,1 notation.
-        result = array([tools.transform_challenge_01_to_11(c) for c in challenges], dtype=dtype)
+        # Compute c^i for all challenges at once, using bit-packed GF(2^n) arithmetic.
+        powers = tools.gf2n_powers(tools.gf2n_pack(challenges), irreducible_polynomial, k)
+        result = tools.gf2n_unpack(powers, n).astype(dtype, copy=False)
 
         assert result.shape == (N, k, n), 'The resulting challenges have not the desired shape.'
         return result
 
     @classmethod
-    def transform_permutation_atf(cls, challenges, k):
+    def transform_permutation_atf(cls, challenges, k, permutations=None):
         """
         This transformation performs first a pseudorandom permutation of the challenge k times before applying the
         ATF transformation to each challenge.
@@ -276,22 +292,18 @@ class LTFArray(Simulation):
                            Array of challenges which should be evaluated by the simulation.
         :param k: int
                   Number of LTFArray PUFs
+        :param permutations: None or array of int of shape (k, n)
+                             Precomputed LTFArray.permutation_atf_indices(n, k), see TransformPlan.
         :return:  array of shape(N,k,n)
                   Array of transformed challenges.
         """
         N = len(challenges)
         n = len(challenges[0])
-        seed = 0x1234
 
         # Perform random permutations
-        sub_challenges = array(
-            [
-                [RandomState(seed + i).permutation(c)
-                 for i in range(k)]
-                for c in challenges
-            ]
-        )
-        result = cls.att(sub_challenges)
+        if permutations is None:
+            permutations = cls.permutation_atf_indices(n, k)
+        result = cls.att(cls.permute(challenges, permutations))
 
         assert result.shape == (N, k, n), 'The resulting challenges have not the desired shape.'
         return result
@@ -300,6 +312,42 @@ class LTFArray(Simulation):
     def transform_random(cls, challenges, k):
         """
         This input transformation chooses for each Arbiter Chain an random challenge based on the initial challenge.
+        The sub-challenges are derived for all challenges at once using a counter-based PRNG: the bit-packed challenge
+        is hashed into a key, the i-th 64 sub-challenge bits are then given by the SplitMix64 output for the key and
+        counter i (see pypuf.tools.splitmix64). The sub-challenge of the l-th Arbiter Chain does not depend on k.
+
+        Note that the sub-challenges differ from those generated by pypuf versions that seeded one
+        numpy.random.RandomState per challenge. To reproduce results obtained with these versions, use
+        transform_random_legacy (or 'random_legacy').
+        :param challenges: array of shape(N,n)
+                           Array of challenges which should be evaluated by the simulation.
+        :param k: int
+                  Number of LTFArray PUFs
+        :return:  array of shape(N,k,n)
+                  Array of transformed challenges.
+        """
+        (N, n) = challenges.shape
+        words = tools.PackedChallenges.pack(challenges).words
+        word_count = words.shape[1]
+
+        key = zeros(N, dtype=tools.WORD_TYPE)
+        for i in range(word_count):
+            key = tools.splitmix64(key ^ words[:, i])
+
+        counters = arange(1, k * word_count + 1, dtype=tools.WORD_TYPE)
+        sub_challenge_words = tools.splitmix64(key[:, None] + counters * tools.SPLITMIX64_GAMMA)
+        result = tools.PackedChallenges(sub_challenge_words.reshape((N * k, word_count)), n).unpack()
+        result = result.reshape((N, k, n)).astype(challenges.dtype, copy=False)
+
+        assert result.shape == (N, k, n), 'The resulting challenges have not the desired shape.'
+        return result
+
+    @classmethod
+    def transform_random_legacy(cls, challenges, k):
+        """
+        This input transformation chooses for each Arbiter Chain an random challenge based on the initial challenge.
+        It seeds one numpy.random.RandomState with each challenge, which is slow, but gives the same sub-challenges
+        as transform_random did in earlier versions of pypuf.
         :param challenges: array of shape(N,n)
                            Array of challenges which should be evaluated by the simulation.
         :param k: int
@@ -318,7 +366,7 @@ class LTFArray(Simulation):
         return result
 
     @classmethod
-    def transform_fixed_permutation(cls, challenges, k):
+    def transform_fixed_permutation(cls, challenges, k, permutations=None):
         """
         Permutes the challenge bits using hardcoded, fix point free permutations designed such that no
         sub-challenge bit gets permuted equally for all other generated sub-challenges. Such permutations
@@ -329,85 +377,18 @@ class LTFArray(Simulation):
                            Array of challenges which should be evaluated by the simulation.
         :param k: int
                   Number of LTFArray PUFs
+        :param permutations: None or array of int of shape (k, n)
+                             Precomputed LTFArray.fixed_permutation_indices(n, k), see TransformPlan.
         :return:  array of shape(N,k,n)
                   Array of transformed challenges.
         """
-        FIXED_PERMUTATION_SEEDS = {
-            # For performance reasons, we do not call self._find_fixed_permutations here.
-            64: [2989, 2992, 3038, 3084, 3457, 6200, 7089, 18369, 21540, 44106],
-            128: [2989, 3006, 3009, 3031, 3437, 4174, 6045, 7906, 11554, 29544],
-        }
-
-        # check parameter n
-        n = len(challenges[0])
-        assert n in FIXED_PERMUTATION_SEEDS.keys(), 'Fixed permutation currently not supported for n=%i, but only ' \
-                                                    'for n in %s. To add support, please use ' \
-                                                    'LTFArray._find_fixed_permutations(n, k).' % \
-                                                    (n, FIXED_PERMUTATION_SEEDS.keys())
-
-        # check parameter k
-        seeds = FIXED_PERMUTATION_SEEDS[n]
-        assert k <= len(seeds), 'Fixed permutation for n=%i currently only supports k<=%i.' % (n, len(seeds))
-
-        # generate permutations
-        permutations = [RandomState(seed).permutation(n) for seed in seeds]
-
         # perform permutations
-        result = swapaxes(
-            array([
-                challenges[:, permutations[i]]
-                for i in range(k)
-            ], dtype=challenges.dtype),
-            0,
-            1
-        )
-
-        result = cls.att(result)
+        if permutations is None:
+            permutations = cls.fixed_permutation_indices(len(challenges[0]), k)
+        result = cls.att(cls.permute(challenges, permutations))
 
         return result
 
-    @classmethod
-    def _find_fixed_permutations(cls, n, k):
-        """
-        Finds permutations suitable to use in LTFArray.transform_fixed_permutation.
-
-        Permutations are chosen such that no permutation has a fix point and no
-        two permutations share at least one point. (See `permutation_okay` below.)
-
-        Note that the run time of this method increases drastically with k. On an
-        Intel i7, n=64, k=10 takes a couple of seconds.
-
-        :return: list of seeds for `RandomState`. Obtain the permutation with
-          `RandomState(seed).permutation(n)`.
-        """
-        def permutation_okay(new_p, ps):
-            # 1. check that p has no fix point
-            if any([i == new_p[i] for i in range(len(new_p))]):
-                return False
-
-            # 2. check that it does not share a point if any old_p in ps:
-            if any([
-                    any([old_p[i] == new_p[i] for i in range(len(new_p))])
-                    for old_p in ps
-            ]):
-                return False
-
-            return True
-
-        seed = 0xbad
-        permutation_seeds = []
-        permutations = []
-
-        while len(permutations) < k:
-            prng = RandomState(seed)
-            p = prng.permutation(n)
-            if permutation_okay(p, permutations):
-                permutation_seeds.append(seed)
-                permutations.append(p)
-            seed += 1
-
-        return permutation_seeds
-
     @classmethod
     def generate_stacked_transform(cls, transform_1, puf_count, transform_2):
         """
@@ -434,8 +415,8 @@ class LTFArray(Simulation):
                     A function that can perform the desired transformation.
            """
             (N, n) = challenges.shape
-            transformed_1 = transform_1(challenges, puf_count)
-            transformed_2 = transform_2(challenges, k - puf_count)
+            transformed_1 = TransformPlan.compile(transform_1, n, puf_count)(challenges)
+            transformed_2 = TransformPlan.compile(transform_2, n, k - puf_count)(challenges)
             assert transformed_1.shape == (N, puf_count, n)
             assert transformed_2.shape == (N, k - puf_count, n)
             return concatenate(
@@ -468,9 +449,6 @@ class LTFArray(Simulation):
         :return:  A function: array of int with shape(N,n), int number of PUFs k -> shape(N,k,n)
                   A function that can perform the desired transformation.
         """
-        prng = RandomState(seed)
-        permutations = [prng.permutation(nn) for _ in range(kk)]
-
         def transform(challenges, k):
             """
             Method as described in generate_concatenated_transform doc string.
@@ -485,14 +463,7 @@ class LTFArray(Simulation):
             assert k == kk and n == nn, \
                 'Permutations Input Transform cannot be used for LTFArrays with size other than defined'
 
-            sub_challenges = swapaxes(
-                array([
-                    challenges[:, permutations[i]]
-                    for i in range(kk)
-                ]),
-                0,
-                1
-            )
+            sub_challenges = cls.permute(challenges, tools.sequential_permutation_table(seed, nn, kk))
 
             if atf:
                 # Perform atf transform
@@ -531,8 +502,8 @@ class LTFArray(Simulation):
             (N, n) = challenges.shape
             challenges1 = challenges[:, :bit_number_transform_1]
             challenges2 = challenges[:, bit_number_transform_1:]
-            transformed_1 = transform_1(challenges1, k)
-            transformed_2 = transform_2(challenges2, k)
+            transformed_1 = TransformPlan.compile(transform_1, bit_number_transform_1, k)(challenges1)
+            transformed_2 = TransformPlan.compile(transform_2, n - bit_number_transform_1, k)(challenges2)
             assert transformed_1.shape == (N, k, bit_number_transform_1)
             assert transformed_2.shape == (N, k, n - bit_number_transform_1)
             return concatenate(
@@ -552,6 +523,19 @@ class LTFArray(Simulation):
 
         return transform
 
+    @classmethod
+    def permute(cls, challenges, permutations):
+        """
+        Applies k permutations to each challenge, using a single gather into a newly allocated array.
+        :param challenges: array of shape (N, n)
+                           Array of challenges which should be evaluated by the simulation.
+        :param permutations: array of int of shape (k, n)
+                             Index table, the i-th sub-challenge is given by challenge[permutations[i]].
+        :return: array of shape (N, k, n)
+                 Array of permuted challenges, with same dtype as challenges.
+        """
+        return take(challenges, permutations, axis=1)
+
     @classmethod
     def att(cls, sub_challenges):
         """
@@ -621,7 +605,8 @@ class LTFArray(Simulation):
         """
         return random_instance.normal(loc=mu, scale=sigma, size=(k, n))
 
-    def __init__(self, weight_array, transform, combiner, bias=None):
+    def __init__(self, weight_array, transform, combiner, bias=None, chunk_size=None, max_memory=None,
+                 workers=None):
         """
         Initializes an LTFArray based on given weight_array and
         combiner function with appropriate transformation of challenges.
@@ -631,9 +616,24 @@ class LTFArray(Simulation):
         :param bias: None, float or a two dimensional array of float with shape (k, 1)
                      This bias value or array of bias values will be appended to the weight_array.
                      Use a single value if you want the same bias for all weight_vectors.
+        :param chunk_size: None or int
+                           If given, challenges are evaluated in chunks of at most this size, such that the memory
+                           used by the evaluation does not depend on the number of challenges. See val.
+        :param max_memory: None or int
+                           Alternative to chunk_size: chooses the chunk size such that evaluating one chunk uses
+                           approximately at most this many bytes.
+        :param workers: None or int
+                        If greater than one, challenges are evaluated in chunks, using a pool of this many threads.
+                        As numpy releases the GIL in its kernels, this uses several cores for large evaluations even if
+                        numpy's own multithreading is disabled. See val_chunked.
         """
         (self.k, self.n) = shape(weight_array)
         self.weight_array = weight_array
+        self.workers = workers
+        self.chunk_size = chunk_size
+        if max_memory is not None:
+            assert chunk_size is None, 'Only one of chunk_size and max_memory can be given.'
+            self.chunk_size = max(1, max_memory // (self.EVAL_MEMORY_FACTOR * self.k * (self.n + 1)))
 
         if isinstance(transform, CompoundTransformation):
             self.transform = transform.build()
@@ -661,10 +661,12 @@ class LTFArray(Simulation):
         else:
             self.bias = bias if isinstance(bias, ndarray) else array(bias)
 
-        # Append bias values to weight array
+        # Append bias values to weight array, keeping the precision of floating point weights
         assert self.bias.shape == (self.k, 1),\
             'Expected bias to either have shape ({}, 1) or be a float, ' \
             'but got an array with shape {} and value {}.'.format(self.k, self.bias.shape, self.bias)
+        if issubdtype(self.weight_array.dtype, floating):
+            self.bias = self.bias.astype(self.weight_array.dtype, copy=False)
         self.weight_array = append(self.weight_array, self.bias, axis=1)
 
     def challenge_length(self) -> int:
@@ -676,24 +678,28 @@ class LTFArray(Simulation):
     def eval(self, challenges, result_type=tools.BIT_TYPE):
         """
         Same es val, but only returns the sign of the responses.
-        :param challenges: array of challenges of shape (N, n)
+        :param challenges: array of challenges of shape (N, n) or pypuf.tools.PackedChallenges
         :param result_type: numpy data type for result
         :return: array of responses of shape (N,)
         """
         return sign(self.val(challenges)).astype(result_type)
 
-    def val(self, challenges):
+    def val_chunk(self, challenges):
         """
-        Evaluates a given array of (master) challenges and returns the precise value of the combined LTFs responses.
-        That is, the master challenges are first transformed into sub-challenges, using this LTFArray's transformation
-        method. The challenges are then evaluated using ltf_eval. The responses are then combined using this LTFArray's
-        combiner.
-        :param challenges: array of shape(N,n)
-                       Array of challenges which should be evaluated by the simulation.
+        Evaluates the given challenges in one piece, regardless of chunk_size and workers, see val.
+        :param challenges: array of shape(N,n) or pypuf.tools.PackedChallenges
+                           Array of challenges which should be evaluated by the simulation.
         :return: array of float or int depending on the combiner of shape (N,)
                  Array of responses for the N different challenges.
         """
-        return self.combiner(self.ltf_eval(self.transform(challenges, self.k)))
+        return self.combiner(self.ltf_eval_challenges(challenges))
+
+    def compiled_transform(self):
+        """
+        Returns the (cached) plan of this LTFArray's input transformation, see TransformPlan.
+        :return: TransformPlan
+        """
+        return TransformPlan.compile(self.transform, self.n, self.k)
 
     def ltf_eval(self, sub_challenges):
         """
@@ -708,28 +714,35 @@ class LTFArray(Simulation):
             'Sub-challenges given to ltf_eval had shape {}, but shape (N, k, n) = (N, {}, {}) was expected.'.format(
                 sub_challenges.shape, self.k, self.n
             )
-        return self.core_eval(self.efba_bit(sub_challenges))
+        return self.core_eval(sub_challenges, bias=True)
 
-    def core_eval(self, efba_sub_challenges):
+    def core_eval(self, sub_challenges, bias=False):
         """
         The core function that evaluates the LTFArray.
-        :param efba_sub_challenges: (Extended for bias awareness sub challenges). Pre-processed challenges, i.e.
-        sub-challenges that have an extra 1-bit at the end.
-        Typically, this array is generated by processing a number of master-challenges with an input transformation
-        into a list of sub-challenge arrays and then processing it with efba_bit.
-        :return: The result of the LTFArray evaluation for each given array of "efba" sub-challenges
+        :param sub_challenges: Sub-challenges of shape (N, k, n), typically generated by processing a number of
+        master-challenges with an input transformation. Alternatively, "efba" (extended for bias awareness)
+        sub-challenges of shape (N, k, n+1) as generated by efba_bit are accepted; these are always evaluated
+        bias-aware.
+        :param bias: bool
+                     If True, the bias weight_array[:, -1] is added to the result of the evaluation of
+                     sub-challenges of shape (N, k, n). This is equivalent to evaluating the "efba" sub-challenges,
+                     but avoids copying the sub-challenges.
+        :return: The result of the LTFArray evaluation for each given array of sub-challenges, shape (N, k)
         """
         assert self.weight_array.shape == (self.k, self.n + 1), \
             'LTFArray\'s weight array was expected have shape (k, n+1) = {}, ' \
             'but had shape {} when core_eval was called.'.format((self.k, self.n + 1), self.weight_array.shape)
-        if efba_sub_challenges.shape[2] == self.n + 1:
-            return einsum('ji,...ji->...j', self.weight_array, efba_sub_challenges, optimize=True)
-        elif efba_sub_challenges.shape[2] == self.n:
-            return einsum('ji,...ji->...j', self.weight_array[:, :-1], efba_sub_challenges, optimize=True)
+        if sub_challenges.shape[2] == self.n + 1:
+            return einsum('ji,...ji->...j', self.weight_array, sub_challenges, optimize=True)
+        elif sub_challenges.shape[2] == self.n:
+            responses = einsum('ji,...ji->...j', self.weight_array[:, :-1], sub_challenges, optimize=True)
+            if bias:
+                responses += self.weight_array[:, -1]
+            return responses
         else:
-            raise ValueError(f'Challenges given to LTFArray.core_eval must be of shape (N, k, n) for bias-unaware '
-                             f'evaluation, and of shape (N, k, n+1) for bias-aware evaluation. This LTFArray has '
-                             f'k={self.k} and n={self.n}, but challenges given had shape {efba_sub_challenges.shape}.')
+            raise ValueError(f'Challenges given to LTFArray.core_eval must be of shape (N, k, n), or of shape '
+                             f'(N, k, n+1) for "efba" sub-challenges. This LTFArray has '
+                             f'k={self.k} and n={self.n}, but challenges given had shape {sub_challenges.shape}.')
 
 
 class NoisyLTFArray(LTFArray):
@@ -796,7 +809,7 @@ class NoisyLTFArray(LTFArray):
         return instance
 
     def __init__(self, weight_array, transform, combiner, sigma_noise,
-                 random_instance=RandomState(), bias=None):
+                 random_instance=RandomState(), bias=None, chunk_size=None, max_memory=None, workers=None):
         """
         Initializes LTF array like in LTFArray and uses the provided
         PRNG instance for drawing noise values. If no PRNG provided, a
@@ -804,8 +817,12 @@ class NoisyLTFArray(LTFArray):
         :param bias: None, float or a two dimensional array of float with shape (k, 1)
                      This bias value or array of bias values will be appended to the weight_array.
                      Use a single value if you want the same bias for all weight_vectors.
+        :param chunk_size: None or int, see LTFArray.
+        :param max_memory: None or int, see LTFArray.
+        :param workers: None or int, see LTFArray.
         """
-        super().__init__(weight_array, transform, combiner, bias)
+        super().__init__(weight_array, transform, combiner, bias, chunk_size=chunk_size, max_memory=max_memory,
+                         workers=workers)
         self.sigma_noise = sigma_noise
         self.random = random_instance
 
@@ -821,6 +838,14 @@ class NoisyLTFArray(LTFArray):
         noise = self.random.normal(loc=0, scale=self.sigma_noise, size=(len(evaled_inputs), self.k))
         return evaled_inputs + noise
 
+    def ltf_eval_packed(self, features):
+        """
+        Evaluates bit-packed feature vectors as in LTFArray.ltf_eval_packed, including noise as in ltf_eval.
+        """
+        evaled_inputs = super().ltf_eval_packed(features)
+        noise = self.random.normal(loc=0, scale=self.sigma_noise, size=(len(evaled_inputs), self.k))
+        return evaled_inputs + noise
+
 
 class SimulationMajorityLTFArray(LTFArray):
     """
@@ -833,7 +858,8 @@ class SimulationMajorityLTFArray(LTFArray):
     """
 
     def __init__(self, weight_array, transform, combiner, sigma_noise,
-                 random_instance_noise=RandomState(), bias=None, vote_count=1):
+                 random_instance_noise=RandomState(), bias=None, vote_count=1, chunk_size=None, max_memory=None,
+                 workers=None):
         """
         :param weight_array: array of floats with shape(k,n)
                             Array of weights which represents the PUF stage delays.
@@ -851,35 +877,50 @@ class SimulationMajorityLTFArray(LTFArray):
                      Use a single value if you want the same bias for all weight_vectors.
         :param vote_count: positive odd int
                            Number which defines the number of evaluations of PUFs in oder to majority vote the output.
+        :param chunk_size: None or int, see LTFArray.
+        :param max_memory: None or int, see LTFArray.
+        :param workers: None or int, see LTFArray.
         """
-        super().__init__(weight_array, transform, combiner, bias=bias)
+        super().__init__(weight_array, transform, combiner, bias=bias, chunk_size=chunk_size, max_memory=max_memory,
+                         workers=workers)
         self.sigma_noise = sigma_noise
         self.random = random_instance_noise
         # majority vote only works with an odd number of votes
         assert vote_count % 2 == 1
         self.vote_count = vote_count
 
-    def val(self, challenges):
+    def val_chunk(self, challenges):
         """
-        This function a calculates the output of the LTFArray based on weights with majority vote.
-        :param challenges: array of int shape(N,k,n)
-                       Array of challenges which should be evaluated by the simulation.
+        This function a calculates the output of the LTFArray based on weights with majority vote, evaluating the
+        given challenges in one piece, see LTFArray.val.
+        :param challenges: array of shape(N,n) or pypuf.tools.PackedChallenges
+                           Array of challenges which should be evaluated by the simulation.
         :return: array of int shape(N)
                  Array of responses for the N different challenges.
         """
-        return self.combiner(self.majority_vote(self.transform(challenges, self.k)))
+        return self.combiner(self.vote(self.ltf_eval_challenges(challenges)))
 
     def majority_vote(self, sub_challenges):
         """
         This function evaluates transformed input challenges and uses majority vote on them.
         :param sub_challenges: array of int with shape(N,k,n)
                                    Array of transformed input challenges.
-        :return: array of int with shape(N,k,n)
+        :return: array of int with shape(N,k)
                  Majority voted responses for each of the k PUFs.
         """
         # Evaluate the sub challenges individually
-        (N, k, _) = sub_challenges.shape
-        evaluated_sub_challenges = super().ltf_eval(sub_challenges)
+        return self.vote(self.ltf_eval(sub_challenges))
+
+    def vote(self, evaluated_sub_challenges):
+        """
+        Evaluates each of the given noiseless LTF responses vote_count times with individual noise and returns the
+        majority vote.
+        :param evaluated_sub_challenges: array of float with shape(N,k)
+                                         Noiseless responses of the k PUFs.
+        :return: array of int with shape(N,k)
+                 Majority voted responses for each of the k PUFs.
+        """
+        (N, k) = evaluated_sub_challenges.shape
 
         # Duplicate the evaluation result for each vote and add individual noise
         # Note the votes are on the first axis
@@ -888,3 +929,16 @@ class SimulationMajorityLTFArray(LTFArray):
 
         # Majority vote (i.e., sign(sum(·))) along the first axis
         return sign(np_sum(sign(evaled_inputs + noise), axis=0))
+
+
+TransformPlan.register(LTFArray.transform_id, packed_kernel=LTFArray.packed_transform_id)
+TransformPlan.register(LTFArray.transform_atf, packed_kernel=LTFArray.packed_transform_atf)
+TransformPlan.register(LTFArray.transform_shift, tables=lambda n, k: dict(indices=LTFArray.shift_indices(n, k)))
+TransformPlan.register(LTFArray.transform_lightweight_secure,
+                       tables=lambda n, k: dict(indices=LTFArray.lightweight_secure_indices(n, k)))
+TransformPlan.register(LTFArray.transform_permutation_atf,
+                       tables=lambda n, k: dict(permutations=LTFArray.permutation_atf_indices(n, k)))
+TransformPlan.register(LTFArray.transform_fixed_permutation,
+                       tables=lambda n, k: dict(permutations=LTFArray.fixed_permutation_indices(n, k)))
+TransformPlan.register(LTFArray.transform_polynomial,
+                       tables=lambda n, k: dict(irreducible_polynomial=LTFArray.irreducible_polynomial(n)))
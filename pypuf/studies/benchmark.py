@@ -1,5 +1,6 @@
 """
-Benchmark the LTFArray.eval method.
+Benchmark the LTFArray.eval method, the logistic regression attack and the gradient computation of the logistic
+regression learner.
 """
 import abc
 import sys
@@ -10,7 +11,7 @@ from pypuf.experiments.experiment.base import Experiment
 from pypuf.learner.regression.logistic_regression import LogisticRegression
 from pypuf.simulation.arbiter_based.ltfarray import LTFArray
 from pypuf.studies.base import Study
-from pypuf.tools import sample_inputs, TrainingSet
+from pypuf.tools import sample_inputs, TrainingSet, ChallengeResponseSet
 from numpy.distutils import cpuinfo
 from numpy.random.mtrand import RandomState
 from os import getpid
@@ -108,19 +109,56 @@ class LRBenchmarkExperiment(LTFBenchmarkExperiment):
         self.learner.learn()
 
 
+class GradientBenchmarkExperiment(LTFBenchmarkExperiment):
+    """
+    Measures the time the logistic regression learner takes to compute one gradient.
+    """
+
+    def __init__(self, progress_log_prefix, parameters):
+        super().__init__(progress_log_prefix, parameters)
+        self.learner = None
+        self.model = None
+        self.sub_challenges = None
+        self.responses = None
+
+    def prepare(self):
+        super().prepare()
+        self.responses = self.ltf_array.eval(self.set)
+        self.learner = LogisticRegression(
+            t_set=ChallengeResponseSet(self.set, self.responses),
+            n=self.parameters.n,
+            k=self.parameters.k,
+            transformation=self.ltf_array.transform,
+            combiner=self.ltf_array.combiner,
+        )
+        self.sub_challenges = self.ltf_array.transform(self.set, self.parameters.k)
+        self.model = LTFArray(
+            weight_array=LTFArray.normal_weights(self.parameters.n, self.parameters.k),
+            transform=self.parameters.transform,
+            combiner=self.parameters.combiner,
+        )
+
+    def run(self):
+        self.learner.gradient(self.model, self.sub_challenges, self.responses)
+
+
 class Benchmark(Study):
     """
-    Measure LTFArray.eval cpu time for a collection of input transformations and input set sizes.
+    Measure cpu time of LTFArray.eval, the logistic regression attack and its gradient computation for a collection
+    of input transformations and input set sizes.
     """
 
     TRANSFORMS = [
         'id',
         'atf',
         'lightweight_secure',
+        'lightweight_secure_legacy',  # reference implementation, to compare against lightweight_secure
         'fixed_permutation',
         'random',
     ]
     SAMPLE_SIZE = 100
+    GRADIENT_KS = range(4, 11)
+    GRADIENT_SAMPLE_SIZE = 10
     SHUFFLE = True
     COMPRESSION = True
 
@@ -173,6 +211,26 @@ class Benchmark(Study):
             for i in range(self.SAMPLE_SIZE)
         ])
 
+        # benchmark LogisticRegression.gradient
+        experiments.extend([
+            GradientBenchmarkExperiment(
+                progress_log_prefix=None,
+                parameters=LTFBenchmarkParameters(
+                    n=64,
+                    k=k,
+                    N=10 ** 6,
+                    transform='atf',
+                    combiner='xor',
+                    seed_input=314159 + i,
+                    version=sys.version,
+                    cpu=cpu,
+                    benchmark_group='LR Gradient k={:02d}'.format(k)
+                )
+            )
+            for k in self.GRADIENT_KS
+            for i in range(self.GRADIENT_SAMPLE_SIZE)
+        ])
+
         return experiments
 
     def plot(self):
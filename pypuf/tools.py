@@ -4,14 +4,18 @@ or polynomial division. The spectrum is rich and the functions are used in many
 helper module.
 """
 import itertools
+from functools import lru_cache
 from importlib import import_module
 from inspect import getmembers, isclass
 from math import ceil, log
+from queue import Queue, Full
+from threading import Event, Thread
 
-from numpy import count_nonzero, array, append, zeros, vstack, mean, prod, ones, dtype, full, shape, copy, int8, \
-    multiply, empty, average
-from numpy import sum as np_sum
+from numpy import count_nonzero, array, append, zeros, mean, prod, ones, dtype, full, shape, copy, int8, \
+    multiply, empty, average, uint8, uint64, packbits, unpackbits, zeros_like
+from numpy import sum as np_sum, load, asarray
 from numpy import abs as np_abs
+from numpy.lib.format import open_memmap
 from numpy.random import RandomState
 from random import sample
 
@@ -19,6 +23,10 @@ from pypuf.simulation.base import Simulation
 from pypuf.studies.base import Study
 
 BIT_TYPE = int8
+WORD_TYPE = uint64
+WORD_BITS = 64
+SPLITMIX64_GAMMA = WORD_TYPE(0x9e3779b97f4a7c15)
+BYTE_POPCOUNT = array([bin(byte).count('1') for byte in range(256)], dtype=uint8)
 
 
 def random_input(n, random_instance=RandomState()):
@@ -46,7 +54,7 @@ def all_inputs(n):
     return (array(list(itertools.product((-1, +1), repeat=n)))).astype(BIT_TYPE)
 
 
-def random_inputs(n, num, random_instance=RandomState()):
+def random_inputs(n, num, random_instance=RandomState(), packed=False):
     """
     This function generates an iterator for a random sample of {-1,1}-vectors of length `n` (with replacement).
     If no PRNG provided, a fresh `numpy.random.RandomState` instance is used.
@@ -56,13 +64,28 @@ def random_inputs(n, num, random_instance=RandomState()):
                 Number of n bit vector
     :param random_instance: numpy.random.RandomState
                             The PRNG which is used to generate the arrays.
+    :param packed: bool
+                   If True, the challenges are returned as PackedChallenges. They are generated block-wise, such that
+                   the full int8 array is never allocated. The result is equal to the packed result of packed=False.
     :return: array of num {-1,1} int8 arrays
              An array with num random {-1,1} int arrays.
     """
-    return 2 * random_instance.randint(0, 2, (num, n), dtype=BIT_TYPE) - 1
+    if not packed:
+        return 2 * random_instance.randint(0, 2, (num, n), dtype=BIT_TYPE) - 1
 
+    # numpy draws bounded int8 values from 32 bit words, hence blocks with a multiple of four
+    # rows consume the PRNG exactly like a single call with all rows.
+    block_size = 2 ** 16
+    words = empty((num, packed_word_count(n)), dtype=WORD_TYPE)
+    for start in range(0, num, block_size):
+        stop = min(start + block_size, num)
+        words[start:stop] = PackedChallenges.pack(
+            2 * random_instance.randint(0, 2, (stop - start, n), dtype=BIT_TYPE) - 1
+        ).words
+    return PackedChallenges(words, n)
 
-def sample_inputs(n, num, random_instance=RandomState()):
+
+def sample_inputs(n, num, random_instance=RandomState(), packed=False):
     """
     This function generates an iterator for either random samples of {-1,1}-vectors of length `n` if `num` < 2^n,
     and an iterator for all {-1,1}-vectors of length `n` otherwise.
@@ -74,10 +97,14 @@ def sample_inputs(n, num, random_instance=RandomState()):
                 Number of n bit vector
     :param random_instance: numpy.random.RandomState
                             The PRNG which is used to generate the arrays.
+    :param packed: bool
+                   If True, the challenges are returned as PackedChallenges.
     :return: array of num {-1,1} int8 arrays
              An array with num random {-1,1} int arrays depending on num and n.
     """
-    return random_inputs(n, num, random_instance) if num < 2 ** n else all_inputs(n)
+    if num < 2 ** n:
+        return random_inputs(n, num, random_instance, packed=packed)
+    return PackedChallenges.pack(all_inputs(n)) if packed else all_inputs(n)
 
 
 def append_last(arr, item):
@@ -215,38 +242,207 @@ def poly_mult_div(challenge, irreducible_polynomial, k):
     Return the list of polynomials
         [challenge^2, challenge^3, ..., challenge^(k+1)] mod irreducible_polynomial
     based on the challenge challenge and the irreducible polynomial irreducible_polynomial.
+    Polynomials are given as coefficient vectors, starting with the coefficient of the highest degree.
+    Challenge can also be an array of N challenges, the powers are then computed for all challenges at once.
     :param challenge: array of int8
-                      Challenge vector in 0,1 notation
+                      Challenge vector in 0,1 notation, or array of shape (N, n) of such vectors
     :param irreducible_polynomial: array of int8
                                    Vector in 0,1 notation
     :param k: int
               Number of PUFs
     :return: array of int8
-             Array of polynomials
+             Array of polynomials, shape (k, n), or shape (N, k, n) if N challenges were given
     """
-    import polymath as pm
     assert_result_type(challenge)
     assert_result_type(irreducible_polynomial)
-    # TODO Change the type to int8 or uint8
-    challenge = challenge.astype('uint8')
-    irreducible_polynomial = irreducible_polynomial.astype('uint8')
-    # TODO Change the type to int8 or uint8
-    # challenge = challenge.astype('int64')
-    # irreducible_polynomial = irreducible_polynomial.astype('int64')
-    c_original = challenge
-    res = None
-    for i in range(k):
-        challenge = pm.polymul(challenge, c_original)
-        challenge = pm.polymodpad(challenge, irreducible_polynomial)
-        if i == 0:
-            res = array([challenge], dtype='int8')
-        else:
-            res = vstack((res, challenge))
-    res = res.astype(BIT_TYPE)
+    n = challenge.shape[-1]
+    challenges = challenge.reshape((-1, n))
+    powers = gf2n_powers(gf2n_pack(1 - 2 * challenges), poly_to_int(irreducible_polynomial), k)
+    res = (gf2n_unpack(powers, n) < 0).astype(BIT_TYPE).reshape(challenge.shape[:-1] + (k, n))
     assert_result_type(res)
     return res
 
 
+def poly_to_int(polynomial):
+    """
+    Converts a polynomial over GF(2), given as coefficient vector in 0,1 notation starting with the coefficient of the
+    highest degree, into an integer whose i-th bit is the coefficient of x^i.
+    :param polynomial: array of int
+    :return: int
+    """
+    return int(''.join(str(int(c)) for c in polynomial), 2)
+
+
+def gf2n_pack(challenges):
+    """
+    Converts challenges of length n <= 64 in -1,1 notation into elements of GF(2^n), represented as uint64 whose i-th
+    bit is the coefficient of x^i. The first challenge bit is the coefficient of the highest degree, -1 corresponds to
+    coefficient 1.
+    :param challenges: array of int8 with shape (N, n)
+    :return: array of uint64 with shape (N,)
+    """
+    assert challenges.shape[1] <= WORD_BITS, 'GF(2^n) arithmetic is only implemented for n <= {}.'.format(WORD_BITS)
+    return PackedChallenges.pack(challenges[:, ::-1]).words[:, 0]
+
+
+def gf2n_unpack(elements, n):
+    """
+    Inverse of gf2n_pack.
+    :param elements: array of uint64 with arbitrary shape S
+    :param n: int
+              Length of the challenges
+    :return: array of int8 with shape S + (n,)
+    """
+    words = elements.reshape((-1, 1))
+    return PackedChallenges(words, n).unpack()[:, ::-1].reshape(elements.shape + (n,))
+
+
+def gf2n_mult(a, b, irreducible_polynomial):
+    """
+    Multiplies elements of GF(2^n) = GF(2)[x] / f, n <= 64, element-wise.
+    Uses carry-less shift-and-add multiplication, reducing modulo f after each shift (Horner's scheme), such that all
+    intermediate values fit into n bits.
+    :param a: array of uint64
+              Elements as given by gf2n_pack.
+    :param b: array of uint64
+              Elements as given by gf2n_pack.
+    :param irreducible_polynomial: int
+                                   The polynomial f of degree n, as given by poly_to_int.
+    :return: array of uint64, the element-wise product a * b mod f
+    """
+    n = irreducible_polynomial.bit_length() - 1
+    assert 1 <= n <= WORD_BITS, 'GF(2^n) arithmetic is only implemented for n <= {}.'.format(WORD_BITS)
+    mask = WORD_TYPE((1 << n) - 1)
+    reduction = WORD_TYPE(irreducible_polynomial & ((1 << n) - 1))
+    result = zeros_like(a, dtype=WORD_TYPE)
+    for i in reversed(range(n)):
+        # result = result * x mod f
+        overflow = (result >> WORD_TYPE(n - 1)) & WORD_TYPE(1)
+        result = ((result << WORD_TYPE(1)) & mask) ^ ((WORD_TYPE(0) - overflow) & reduction)
+        # result += b_i * a
+        result ^= a & (WORD_TYPE(0) - ((b >> WORD_TYPE(i)) & WORD_TYPE(1)))
+    return result
+
+
+def splitmix64(x):
+    """
+    Computes the SplitMix64 output function for each given state, that is, adds SPLITMIX64_GAMMA and applies the
+    finalizer of Steele et al., "Fast splittable pseudorandom number generators", OOPSLA 2014.
+    Using the state key + i * SPLITMIX64_GAMMA, this gives the i-th output of a SplitMix64 generator seeded with key,
+    which can be computed for all keys and counters at once.
+    :param x: array of uint64
+    :return: array of uint64 with same shape as x
+    """
+    z = x + SPLITMIX64_GAMMA
+    z = (z ^ (z >> WORD_TYPE(30))) * WORD_TYPE(0xbf58476d1ce4e5b9)
+    z = (z ^ (z >> WORD_TYPE(27))) * WORD_TYPE(0x94d049bb133111eb)
+    return z ^ (z >> WORD_TYPE(31))
+
+
+def gf2n_powers(elements, irreducible_polynomial, k):
+    """
+    Computes the powers [c^2, c^3, ..., c^(k+1)] mod f for all given elements c of GF(2^n).
+    :param elements: array of uint64 with shape (N,)
+                     Elements as given by gf2n_pack.
+    :param irreducible_polynomial: int
+                                   The polynomial f of degree n, as given by poly_to_int.
+    :param k: int
+              Number of powers
+    :return: array of uint64 with shape (N, k)
+    """
+    powers = empty((len(elements), k), dtype=WORD_TYPE)
+    power = elements
+    for i in range(k):
+        power = gf2n_mult(power, elements, irreducible_polynomial)
+        powers[:, i] = power
+    return powers
+
+
+@lru_cache(maxsize=256)
+def permutation_table(seeds, n):
+    """
+    Returns the permutations given by RandomState(seed).permutation(n) for each of the given seeds as index table.
+    Results are cached, hence the returned table is read-only.
+    :param seeds: tuple of int
+                  Seeds of the permutations, one for each row of the table.
+    :param n: int
+              Length of the permutations
+    :return: array of int of shape (len(seeds), n)
+    """
+    table = array([RandomState(seed).permutation(n) for seed in seeds])
+    table.flags.writeable = False
+    return table
+
+
+@lru_cache(maxsize=256)
+def sequential_permutation_table(seed, n, k):
+    """
+    Returns k permutations of length n that are consecutively drawn from RandomState(seed) as index table.
+    Results are cached, hence the returned table is read-only.
+    :param seed: int
+                 Seed of the pseudo random number generator
+    :param n: int
+              Length of the permutations
+    :param k: int
+              Number of permutations
+    :return: array of int of shape (k, n)
+    """
+    prng = RandomState(seed)
+    table = array([prng.permutation(n) for _ in range(k)])
+    table.flags.writeable = False
+    return table
+
+
+def prefetched(iterable, size=1):
+    """
+    Iterates over the given iterable, while a background thread computes up to size items in advance.
+    Exceptions raised while computing the items are raised again in the iterating thread. Closing the returned
+    generator (or garbage collecting it) stops the background thread.
+    :param iterable: iterable
+                     Items to compute in the background. Note that the items are computed in another thread, hence
+                     they must not depend on state that is modified while iterating.
+    :param size: int
+                 Maximum number of items computed in advance.
+    :return: generator of the items of iterable
+    """
+    items = Queue(maxsize=size)
+    stop = Event()
+    end = object()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=.1)
+                return True
+            except Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put((item, None)):
+                    return
+        except Exception as exception:  # pylint: disable=broad-except
+            put((end, exception))
+            return
+        put((end, None))
+
+    producer = Thread(target=produce, daemon=True)
+    producer.start()
+    try:
+        while True:
+            item, exception = items.get()
+            if exception is not None:
+                raise exception
+            if item is end:
+                return
+            yield item
+    finally:
+        stop.set()
+        producer.join()
+
+
 def approx_stabilities(instance, num, reps, random_instance=RandomState()):
     """
     This function approximates the stability of the given `instance` for
@@ -278,7 +474,7 @@ def assert_result_type(arr):
     assert arr.dtype == dtype(BIT_TYPE), 'Must be an array of {0}. Got array of {1}'.format(BIT_TYPE, arr.dtype)
 
 
-def parse_file(filename, n, start=1, num=0, in_11_notation=False):
+def parse_file(filename, n, start=1, num=0, in_11_notation=False, packed=False):
     """
     Reads challenge-response pairs from a file.
     The format is one pair per line, first all n inputs (challenge) separated
@@ -294,6 +490,8 @@ def parse_file(filename, n, start=1, num=0, in_11_notation=False):
     :param in_11_notation: bool
                            Format the file is in
                            True for -1,1 notation, False for 0,1
+    :param packed: bool
+                   If True, the challenges of the returned set are PackedChallenges
     :return: tools.TrainingSet
              A TraningSet with the num challenges and responses that were read
     """
@@ -333,9 +531,144 @@ def parse_file(filename, n, start=1, num=0, in_11_notation=False):
         challenges = transform_challenge_01_to_11(challenges)
         responses = transform_challenge_01_to_11(responses)
 
+    if packed:
+        challenges = PackedChallenges.pack(challenges)
+
     return ChallengeResponseSet(challenges, responses)
 
 
+def packed_word_count(n):
+    """
+    Returns the number of words needed to store a bit-packed challenge of length n.
+    :param n: int
+              Challenge length
+    :return: int
+    """
+    return (n + WORD_BITS - 1) // WORD_BITS
+
+
+def pack_bits(bits):
+    """
+    Packs an array of bits along its last axis into words, padded with zero bits.
+    :param bits: array of bool of shape (..., N)
+    :return: array of WORD_TYPE of shape (..., packed_word_count(N))
+    """
+    N = bits.shape[-1]
+    padded = zeros(bits.shape[:-1] + (packed_word_count(N) * WORD_BITS,), dtype=bool)
+    padded[..., :N] = bits
+    return packbits(padded, axis=-1).view(WORD_TYPE)
+
+
+def popcount(words):
+    """
+    Counts the set bits of an array of words along its last axis.
+    :param words: array of unsigned int of shape (..., W), C-contiguous
+    :return: array of int of shape (...)
+    """
+    return np_sum(BYTE_POPCOUNT[words.view(uint8)], axis=-1)
+
+
+class PackedChallenges:
+    """
+    A list of N challenges of length n, stored bit-packed in an array of shape (N, ceil(n / 64)) of uint64 words,
+    using one bit per challenge bit. This uses an eighth of the memory needed for the usual int8 representation.
+    Bits are stored in 0,1 notation, i.e. -1 is stored as 1 and +1 is stored as 0. Challenge bit i is stored in
+    word i // 64 at bit position i % 64, unused bits of the last word are always 0.
+    """
+
+    def __init__(self, words, n):
+        """
+        :param words: array of uint64 with shape (N, ceil(n / 64))
+                      The bit-packed challenges.
+        :param n: int
+                  Challenge length
+        """
+        assert words.dtype == dtype(WORD_TYPE), \
+            'Must be an array of {0}. Got array of {1}'.format(WORD_TYPE, words.dtype)
+        assert words.ndim == 2 and words.shape[1] == packed_word_count(n), \
+            'Packed {}-bit challenges must have shape (N, {}), but had shape {}.'.format(
+                n, packed_word_count(n), words.shape)
+        self.words = words
+        self.n = n
+
+    @classmethod
+    def pack(cls, challenges):
+        """
+        Packs challenges given in -1,1 notation.
+        :param challenges: array of int8 with shape (N, n)
+                           Challenges in -1,1 notation
+        :return: PackedChallenges
+        """
+        (N, n) = challenges.shape
+        word_count = packed_word_count(n)
+        bits = zeros((N, word_count * WORD_BITS), dtype=uint8)
+        bits[:, :n] = challenges < 0
+        # numpy packs the first bit into the most significant bit of each byte, we want it the other way round
+        octets = packbits(bits.reshape((N, word_count * 8, 8))[:, :, ::-1], axis=2).reshape((N, word_count * 8))
+        return cls(octets.view('<u8').astype(WORD_TYPE), n)
+
+    def unpack(self):
+        """
+        Unpacks the challenges into -1,1 notation.
+        :return: array of int8 with shape (N, n)
+        """
+        N = len(self.words)
+        octets = self.words.astype('<u8').view(uint8)
+        bits = unpackbits(octets.reshape((N, -1, 1)), axis=2)[:, :, ::-1].reshape((N, -1))[:, :self.n]
+        return 1 - 2 * bits.astype(BIT_TYPE)
+
+    def suffix_parity(self):
+        """
+        Computes the suffix parities of the challenges, i.e. bit i of the result is the XOR of the bits i, ..., n-1
+        of the challenge. In -1,1 notation, this is the product of the challenge bits i, ..., n-1, hence this is the
+        ATF transform on bit-packed challenges. Within each word, the suffix parity is computed with a logarithmic
+        number of shift-XOR steps, the parity of all following words is then carried into each word.
+        :return: PackedChallenges
+        """
+        parities = self.words.copy()
+        for shift in [1, 2, 4, 8, 16, 32]:
+            parities ^= parities >> WORD_TYPE(shift)
+
+        # bit 0 of each word now holds the parity of the whole word
+        carry = zeros(len(parities), dtype=WORD_TYPE)
+        for word in reversed(range(parities.shape[1])):
+            word_parity = parities[:, word] & WORD_TYPE(1)
+            parities[:, word] ^= WORD_TYPE(0) - carry
+            carry ^= word_parity
+        return PackedChallenges(parities, self.n)
+
+    @property
+    def shape(self):
+        """
+        The shape of the unpacked challenge array, (N, n).
+        """
+        return len(self.words), self.n
+
+    @property
+    def nbytes(self):
+        """
+        Memory used to store the packed challenges.
+        """
+        return self.words.nbytes
+
+    def __len__(self):
+        return len(self.words)
+
+    def __getitem__(self, item):
+        """
+        Indexing with an int gives the unpacked challenge, all other indices (slices, index arrays, ...) give
+        the selected challenges as PackedChallenges.
+        """
+        words = self.words[item]
+        if words.ndim == 1:
+            return PackedChallenges(words.reshape((1, -1)), self.n).unpack()[0]
+        return PackedChallenges(words, self.n)
+
+    def __eq__(self, other):
+        return isinstance(other, PackedChallenges) and self.n == other.n and \
+            self.words.shape == other.words.shape and bool((self.words == other.words).all())
+
+
 class ChallengeResponseSet:
     """
     A set of challenges and corresponding responses.
@@ -386,6 +719,65 @@ class ChallengeResponseSet:
             responses=self.responses[subset_slice]
         )
 
+    def pack(self):
+        """
+        Gives this challenge response set with bit-packed challenges.
+        :return: A challenge response set with PackedChallenges
+        """
+        if isinstance(self.challenges, PackedChallenges):
+            return ChallengeResponseSet(self.challenges, self.responses)
+        return ChallengeResponseSet(PackedChallenges.pack(self.challenges), self.responses)
+
+    def unpack(self):
+        """
+        Gives this challenge response set with challenges as array of int8 in -1,1 notation.
+        :return: A challenge response set with unpacked challenges
+        """
+        if isinstance(self.challenges, PackedChallenges):
+            return ChallengeResponseSet(self.challenges.unpack(), self.responses)
+        return ChallengeResponseSet(self.challenges, self.responses)
+
+    def save(self, filename, block_size=10**6):
+        """
+        Saves this challenge response set into a numpy file (.npy), with one record per challenge response pair.
+        The file is written block by block, hence no copy of the whole set is made in memory. Packed challenges are
+        unpacked block by block and saved in -1,1 notation.
+        :param filename: Name of the file, should end in .npy.
+        :param block_size: Number of challenge response pairs written at a time.
+        """
+        packed = isinstance(self.challenges, PackedChallenges)
+        records = open_memmap(
+            filename,
+            mode='w+',
+            dtype=[
+                ('challenges', BIT_TYPE if packed else self.challenges.dtype, (self.challenges.shape[1],)),
+                ('responses', self.responses.dtype),
+            ],
+            shape=(self.N,),
+        )
+        for start in range(0, self.N, block_size):
+            block = self.challenges[start:start + block_size]
+            # packed challenges are unpacked one block at a time
+            records['challenges'][start:start + block_size] = block.unpack() if packed else block
+            records['responses'][start:start + block_size] = self.responses[start:start + block_size]
+        records.flush()
+        del records
+
+    @classmethod
+    def load(cls, filename, mmap_mode='r'):
+        """
+        Loads a challenge response set saved with save. By default, the file is memory-mapped, i.e. challenges and
+        responses are only read from disk when accessed.
+        :param filename: Name of the file.
+        :param mmap_mode: Memory-map mode, see numpy.load. Use None to read the whole file into memory.
+        :return: A challenge response set
+        """
+        records = load(filename, mmap_mode=mmap_mode)
+        return cls(
+            challenges=asarray(records['challenges']),
+            responses=asarray(records['responses']),
+        )
+
 
 class TrainingSet(ChallengeResponseSet):
     """
@@ -393,7 +785,7 @@ class TrainingSet(ChallengeResponseSet):
     Note that this is, strictly speaking, not a set.
     """
 
-    def __init__(self, instance, N, random_instance=RandomState()):
+    def __init__(self, instance, N, random_instance=RandomState(), packed=False):
         """
         :param instance: pypuf.simulation.base.Simulation
                          Instance which is used to generate responses for random challenges.
@@ -401,9 +793,15 @@ class TrainingSet(ChallengeResponseSet):
                   Number of desired challenges
         :param random_instance: numpy.random.RandomState
                                 PRNG which is used to draft challenges.
+        :param packed: bool
+                       If True, challenges are stored as PackedChallenges. The instance must accept these for
+                       evaluation.
         """
         self.instance = instance
-        challenges = array(list(sample_inputs(instance.n, N, random_instance=random_instance)))
+        if packed:
+            challenges = sample_inputs(instance.n, N, random_instance=random_instance, packed=True)
+        else:
+            challenges = array(list(sample_inputs(instance.n, N, random_instance=random_instance)))
         super().__init__(
             challenges=challenges,
             responses=instance.eval(challenges)
@@ -0,0 +1,217 @@
+"""This module tests the correlation attack learner."""
+import logging
+import unittest
+from unittest.mock import patch
+from itertools import permutations
+from os import listdir, path
+from tempfile import TemporaryDirectory
+from scipy.io import loadmat
+from numpy import array, zeros, load
+from numpy.random import RandomState
+from numpy.testing import assert_array_equal, assert_allclose
+from pypuf.simulation.arbiter_based.ltfarray import LTFArray
+from pypuf.learner.regression import correlation_attack
+from pypuf.learner.regression.correlation_attack import CorrelationAttack
+from pypuf.learner.regression.logistic_regression import LogisticRegression
+from pypuf.tools import TrainingSet
+
+
+class TestCorrelationAttack(unittest.TestCase):
+    """
+    This class tests the correlation attack learner.
+    """
+
+    def attack(self, n, k, workers=None):
+        """
+        Creates a correlation attack on a random k-XOR Lightweight Secure PUF.
+        """
+        instance = LTFArray(
+            weight_array=LTFArray.normal_weights(n, k, random_instance=RandomState(0x1)),
+            transform=LTFArray.transform_lightweight_secure,
+            combiner=LTFArray.combiner_xor,
+        )
+        return CorrelationAttack(
+            n=n,
+            k=k,
+            training_set=TrainingSet(instance=instance, N=1000, random_instance=RandomState(0x2)),
+            validation_set=TrainingSet(instance=instance, N=1000, random_instance=RandomState(0x3)),
+            weights_prng=RandomState(0x4),
+            logger=logging.getLogger(),
+            workers=workers,
+        )
+
+    def test_adopt_weights_batch(self):
+        """
+        Adopting weights with many permutations at once must give the same weights as adopting them one by one.
+        """
+        n, k = 64, 4
+        attack = self.attack(n, k)
+        weights = LTFArray.normal_weights(n + 1, k, random_instance=RandomState(0x5))
+        candidates = array(list(permutations(range(k))))
+        adopted_weights = attack.adopt_weights_batch(weights, candidates)
+        for permutation, permuted_weights in zip(candidates, adopted_weights):
+            assert_array_equal(permuted_weights, attack.adopt_weights(weights, permutation))
+
+    def test_packed_accuracies(self):
+        """
+        The accuracies of permuted models computed from packed response signs must equal the accuracies of each
+        permuted model.
+        """
+        n, k = 64, 4
+        weights = LTFArray(
+            weight_array=LTFArray.normal_weights(n, k, random_instance=RandomState(0x6)),
+            transform=LTFArray.transform_lightweight_secure,
+            combiner=LTFArray.combiner_xor,
+            bias=RandomState(0x7).normal(size=(k, 1)),
+        ).weight_array
+        candidates = array(list(permutations(range(k))))
+        attack = self.attack(n, k)
+        accuracies = attack.packed_accuracies(candidates, *attack.packed_response_signs(weights), 1000)
+        permuted_model = LTFArray(zeros((k, n)), LTFArray.transform_lightweight_secure, LTFArray.combiner_xor)
+        for permutation, accuracy in zip(candidates, accuracies):
+            permuted_model.weight_array = attack.adopt_weights(weights, permutation)
+            self.assertEqual(accuracy, attack.approx_accuracy(permuted_model))
+
+    def test_response_cube(self):
+        """
+        The response cube must hold the response of each chain adopted into each slot.
+        """
+        n, k = 64, 4
+        attack = self.attack(n, k)
+        weights = LTFArray.normal_weights(n + 1, k, random_instance=RandomState(0x8))
+        cube = attack.response_cube(weights)
+        model = LTFArray(zeros((k, n)), LTFArray.transform_lightweight_secure, LTFArray.combiner_xor)
+        for permutation in permutations(range(k)):
+            model.weight_array = attack.adopt_weights(weights, permutation)
+            chain_responses = model.core_eval(attack.validation_set_transformed.challenges, bias=True)
+            for l in range(k):
+                assert_allclose(cube[:, l, permutation[l]], chain_responses[:, permutation[l]])
+
+    def test_find_high_accuracy_weight_permutations(self):
+        """
+        The permutation search must give the permutations with the highest accuracy, like sorting all permutations.
+        """
+        n, k = 64, 5
+        attack = self.attack(n, k)
+        instance = LTFArray(
+            weight_array=LTFArray.normal_weights(n, k, random_instance=RandomState(0x1)),
+            transform=LTFArray.transform_lightweight_secure,
+            combiner=LTFArray.combiner_xor,
+        )
+        # the initial model has some chains in the wrong slots
+        weights = attack.adopt_weights(instance.weight_array, (0, 1, 3, 4, 2))
+        weights += RandomState(0x9).normal(scale=.05, size=weights.shape)
+        threshold = .6
+
+        candidates = array(list(permutations(range(k)))[1:])
+        accuracies = attack.packed_accuracies(candidates, *attack.packed_response_signs(weights), 1000)
+        order = sorted(range(len(candidates)), key=lambda i: -accuracies[i])[:5 * k]
+        expected = [(tuple(candidates[i]), accuracies[i]) for i in order if accuracies[i] >= threshold]
+
+        for workers, search_batch_chains in [(None, 5), (None, 2), (2, 2)]:
+            attack.workers = workers
+            # search_permutations is a class method, hence the batch size must be changed on the class
+            with patch.object(CorrelationAttack, 'SEARCH_BATCH_CHAINS', search_batch_chains):
+                self.assertEqual(attack.find_high_accuracy_weight_permutations(weights, threshold), expected)
+
+        # pruning by correlation keeps the permutations with high accuracy
+        response_signs = attack.packed_response_signs(weights)
+        pruned = CorrelationAttack.search_permutations(*response_signs, 1000, attack.correlation_bias, threshold, 5 * k)
+        pruned = [(permutation, accuracy) for accuracy, _, permutation in sorted(pruned, reverse=True)]
+        self.assertEqual(pruned, expected)
+
+    def test_learn_concurrent_restarts(self):
+        """
+        Learning permuted models several at once must find the same permutation as learning them one by one.
+        """
+        n, k = 64, 4
+        instance = LTFArray(
+            weight_array=LTFArray.normal_weights(n, k, random_instance=RandomState(0x3)),
+            transform=LTFArray.transform_lightweight_secure,
+            combiner=LTFArray.combiner_xor,
+        )
+        training_set = TrainingSet(instance=instance, N=12000, random_instance=RandomState(0x67))
+        validation_set = TrainingSet(instance=instance, N=1200, random_instance=RandomState(0xCB))
+        results = []
+        for concurrent_restarts in [1, 4]:
+            attack = CorrelationAttack(
+                n=n,
+                k=k,
+                training_set=training_set,
+                validation_set=validation_set,
+                weights_prng=RandomState(0x12F),
+                logger=logging.getLogger(),
+                concurrent_restarts=concurrent_restarts,
+            )
+            with patch.object(LogisticRegression, 'sub_challenges_of',
+                              wraps=LogisticRegression.sub_challenges_of) as sub_challenges_of:
+                attack.learn()
+            # the training set is transformed only once, all runs of the LR learner share its sub-challenges
+            self.assertEqual(sum(len(args[0]) == training_set.N for args, _ in sub_challenges_of.call_args_list), 1)
+            self.assertGreater(attack.best_accuracy, attack.OPTIMIZATION_ACCURACY_GOAL)
+            self.assertIn(attack.total_permutation_iterations, range(1, 5))
+            results.append((attack.best_permutation, attack.best_permutation_iteration))
+        self.assertEqual(results[0], results[1])
+
+    def test_shift_overview_data(self):
+        """
+        The computed shift overview must match the shift overview given in the MATLAB file, which is kept in the
+        data directory as reference.
+        """
+        data_directory = path.dirname(CorrelationAttack.SHIFT_OVERVIEW_FILE)
+        mat_file = path.join(data_directory, 'correlation_permutations_lightweight_secure_64_10.mat')
+        shift_overview = loadmat(mat_file)['shiftOverviewData']
+        computed_shift_overview = CorrelationAttack.shift_overview_data(64, 10, N=2000)
+        assert_array_equal(computed_shift_overview[:, :, 0], shift_overview[:, :, 0])
+        assert_allclose(computed_shift_overview[:, :, 1], shift_overview[:, :, 1], atol=.01)
+
+    def test_shift_overview(self):
+        """
+        Shift overviews must be computed once, cached and then loaded. The tables for 64 and 128 bit are shipped.
+        """
+        for n in [64, 128]:
+            self.assertTrue(path.exists(CorrelationAttack.SHIFT_OVERVIEW_FILE % (n, 10)))
+        with TemporaryDirectory() as directory:
+            file = CorrelationAttack.SHIFT_OVERVIEW_FILE
+            CorrelationAttack.SHIFT_OVERVIEW_FILE = path.join(directory, 'shift_overview_%i_%i.npy')
+            try:
+                shift_overview = CorrelationAttack.shift_overview(32, 4)
+                self.assertEqual(shift_overview.shape, (10, 10, 2))
+                self.assertIs(CorrelationAttack.shift_overview(32, 6), shift_overview)
+                self.assertTrue(path.exists(path.join(directory, 'shift_overview_32_10.npy')))
+                assert_array_equal(load(path.join(directory, 'shift_overview_32_10.npy')), shift_overview)
+                self.assertEqual(CorrelationAttack.shift_overview(32, 12).shape, (12, 12, 2))
+
+                # tables that cannot be cached are still given, without leaving temporary files
+                with patch.object(correlation_attack, 'replace', side_effect=OSError('read-only')):
+                    with self.assertLogs(level='WARNING'):
+                        self.assertEqual(CorrelationAttack.shift_overview(30, 4).shape, (10, 10, 2))
+                self.assertEqual(sorted(listdir(directory)), ['shift_overview_32_10.npy', 'shift_overview_32_12.npy'])
+            finally:
+                CorrelationAttack.SHIFT_OVERVIEW_FILE = file
+                for n, k in [(32, 10), (32, 12), (30, 10)]:
+                    correlation_attack._SHIFT_OVERVIEWS.pop((n, k), None)  # pylint: disable=protected-access
+
+    def test_find_high_accuracy_weight_permutations_pruned(self):
+        """
+        On this instance, pruning the permutation search by correlation must give the same permutations as the
+        exhaustive search.
+        """
+        n, k = 64, 9
+        attack = self.attack(n, k)
+        instance = LTFArray(
+            weight_array=LTFArray.normal_weights(n, k, random_instance=RandomState(0x1)),
+            transform=LTFArray.transform_lightweight_secure,
+            combiner=LTFArray.combiner_xor,
+        )
+        weights = attack.adopt_weights(instance.weight_array, (0, 1, 3, 4, 2, 5, 6, 7, 8))
+        weights += RandomState(0x9).normal(scale=.05, size=weights.shape)
+        model = LTFArray(zeros((k, n)), LTFArray.transform_lightweight_secure, LTFArray.combiner_xor)
+        model.weight_array = weights
+        threshold = 1.2 * attack.approx_accuracy(model) - .2
+
+        exhaustive = attack.find_high_accuracy_weight_permutations(weights, threshold)
+        attack.prune_permutations = True
+        pruned = attack.find_high_accuracy_weight_permutations(weights, threshold)
+        self.assertEqual(len(exhaustive), 5 * k)
+        self.assertEqual(pruned, exhaustive)
@@ -0,0 +1,130 @@
+"""
+This module is used to test the evaluation machinery of LTFArray, i.e. transform plans, the evaluation of bit-packed
+challenges and the evaluation in chunks.
+"""
+import unittest
+from numpy.testing import assert_array_equal, assert_allclose
+from numpy.random import RandomState
+from pypuf.simulation.arbiter_based.ltfarray import LTFArray, NoisyLTFArray, CompoundTransformation
+from pypuf.simulation.arbiter_based.evaluation import TransformPlan
+from pypuf import tools
+
+
+class TestTransformPlan(unittest.TestCase):
+    """
+    This class tests the compilation and caching of input transformations.
+    """
+
+    def test_transform_plan(self):
+        """This method checks that transform plans are cached and agree with the plain input transformations."""
+        n, k = 64, 4
+        challenges = tools.random_inputs(n, 100, RandomState(0xdead))
+        for transform in [
+                LTFArray.transform_shift,
+                LTFArray.transform_lightweight_secure,
+                LTFArray.transform_permutation_atf,
+                LTFArray.transform_fixed_permutation,
+                LTFArray.transform_polynomial,
+                LTFArray.transform_atf,
+                LTFArray.generate_stacked_transform(LTFArray.transform_shift, 2, LTFArray.transform_atf),
+                LTFArray.generate_concatenated_transform(LTFArray.transform_shift, 32, LTFArray.transform_atf),
+                CompoundTransformation(LTFArray.generate_random_permutation_transform, (1, n, k, True)),
+        ]:
+            plan = TransformPlan.compile(transform, n, k)
+            self.assertIs(plan, TransformPlan.compile(transform, n, k))
+            self.assertEqual(plan.__name__, transform.__name__)
+            assert_array_equal(plan(challenges), transform(challenges, k))
+
+        self.assertIn('indices', TransformPlan.compile(LTFArray.transform_shift, n, k).tables)
+        self.assertIsNotNone(TransformPlan.compile(LTFArray.transform_atf, n, k).packed_kernel)
+        self.assertIsNone(TransformPlan.compile(LTFArray.transform_shift, n, k).packed_kernel)
+
+
+class TestPackedEvaluation(unittest.TestCase):
+    """
+    This class tests the evaluation of LTFArrays on bit-packed challenges.
+    """
+
+    def test_eval_packed(self):
+        """
+        Evaluating packed challenges must give the same responses as evaluating unpacked challenges.
+        """
+        n, k, N = 64, 4, 1000
+        challenges = tools.random_inputs(n, N, RandomState(0xCAFE))
+        for transform in ['id', 'atf', 'lightweight_secure']:
+            ltf_array = LTFArray(
+                weight_array=LTFArray.normal_weights(n, k, random_instance=RandomState(0xC0DE)),
+                transform=transform,
+                combiner=LTFArray.combiner_xor,
+                bias=.1,
+            )
+            assert_array_equal(
+                ltf_array.eval(tools.PackedChallenges.pack(challenges)),
+                ltf_array.eval(challenges),
+            )
+
+    def test_ltf_eval_packed(self):
+        """
+        The bit-packed evaluation of transform_id and transform_atf must match the evaluation of sub-challenges.
+        """
+        N, k = 500, 3
+        for n in [8, 64, 65, 100]:
+            challenges = tools.random_inputs(n, N, RandomState(n))
+            packed_challenges = tools.PackedChallenges.pack(challenges)
+            for transform in [LTFArray.transform_id, LTFArray.transform_atf]:
+                ltf_array = LTFArray(
+                    weight_array=LTFArray.normal_weights(n, k, random_instance=RandomState(0xC0DE)),
+                    transform=transform,
+                    combiner=LTFArray.combiner_xor,
+                    bias=RandomState(0xB1A5).normal(size=k),
+                )
+                packed_transform = ltf_array.packed_transform()
+                self.assertIsNotNone(packed_transform)
+                assert_allclose(
+                    ltf_array.ltf_eval_packed(packed_transform(packed_challenges)),
+                    ltf_array.ltf_eval(transform(challenges, k)),
+                )
+        self.assertIsNone(LTFArray(LTFArray.normal_weights(8, 1), 'shift', 'xor').packed_transform())
+
+
+class TestChunkedEvaluation(unittest.TestCase):
+    """
+    This class tests the evaluation of LTFArrays in chunks and with several worker threads.
+    """
+
+    def test_val_chunked(self):
+        """
+        Chunked evaluation must give the same results as evaluation in one piece.
+        """
+        n, k, N = 64, 4, 1003
+        challenges = tools.random_inputs(n, N, RandomState(0xC4C4))
+        weight_array = LTFArray.normal_weights(n, k, random_instance=RandomState(0xC0DE))
+        for transform in ['id', 'atf', 'lightweight_secure']:
+            ltf_array = LTFArray(weight_array, transform, LTFArray.combiner_xor)
+            for chunked_ltf_array in [
+                    LTFArray(weight_array, transform, LTFArray.combiner_xor, chunk_size=100),
+                    LTFArray(weight_array, transform, LTFArray.combiner_xor, max_memory=10 ** 5),
+                    LTFArray(weight_array, transform, LTFArray.combiner_xor, chunk_size=100, workers=3),
+            ]:
+                self.assertLess(chunked_ltf_array.chunk_size, N)
+                assert_array_equal(chunked_ltf_array.val(challenges), ltf_array.val(challenges))
+                assert_array_equal(chunked_ltf_array.eval(tools.PackedChallenges.pack(challenges)),
+                                   ltf_array.eval(challenges))
+
+        noisy_ltf_array = NoisyLTFArray(weight_array, 'atf', LTFArray.combiner_xor, 1, RandomState(0x5EED))
+        chunked_noisy_ltf_array = NoisyLTFArray(weight_array, 'atf', LTFArray.combiner_xor, 1, RandomState(0x5EED),
+                                                chunk_size=100)
+        assert_array_equal(chunked_noisy_ltf_array.val(challenges), noisy_ltf_array.val(challenges))
+
+    def test_val_workers(self):
+        """
+        Evaluation using several worker threads must give the same results as evaluation in one piece.
+        """
+        n, k, N = 32, 2, 5000
+        challenges = tools.random_inputs(n, N, RandomState(0xC4C5))
+        weight_array = LTFArray.normal_weights(n, k, random_instance=RandomState(0xC0DF))
+        ltf_array = LTFArray(weight_array, 'atf', LTFArray.combiner_xor)
+        parallel_ltf_array = LTFArray(weight_array, 'atf', LTFArray.combiner_xor, workers=4)
+        parallel_ltf_array.MIN_WORKER_CHUNK_SIZE = 1000
+        assert_array_equal(parallel_ltf_array.val(challenges), ltf_array.val(challenges))
+        assert_array_equal(parallel_ltf_array.val(challenges[:10]), ltf_array.val(challenges[:10]))
@@ -1,9 +1,15 @@
 """This module tests the logistic regression learner."""
 import unittest
+from unittest.mock import patch
+from copy import deepcopy
+from numpy import prod, sign, minimum, exp, dot, zeros, array, seterr, array_split, full, abs as np_abs
 from numpy.random import RandomState
+from numpy.testing import assert_allclose, assert_array_equal
+from tempfile import NamedTemporaryFile
+from tracemalloc import start, stop, get_traced_memory
 from pypuf.simulation.arbiter_based.ltfarray import LTFArray
 from pypuf.learner.regression.logistic_regression import LogisticRegression
-from pypuf.tools import TrainingSet
+from pypuf.tools import TrainingSet, ChallengeResponseSet, approx_dist, approx_dist_nonrandom
 
 
 class TestLogisticRegression(unittest.TestCase):
@@ -69,3 +75,475 @@ class TestLogisticRegression(unittest.TestCase):
             weights_prng=model_prng,
         )
         lr_learner.learn()
+
+    def test_gradient_bias(self):
+        """
+        The gradient of bias-aware learning must not depend on whether "efba" sub-challenges are given.
+        """
+        n, k, N = 16, 2, 1000
+        instance = LTFArray(
+            weight_array=LTFArray.normal_weights(n, k, random_instance=RandomState(0x1)),
+            transform=LTFArray.transform_atf,
+            combiner=LTFArray.combiner_xor,
+            bias=.5,
+        )
+        training_set = TrainingSet(instance=instance, N=N, random_instance=RandomState(0x2))
+        model = LTFArray(
+            weight_array=LTFArray.normal_weights(n, k, random_instance=RandomState(0x3)),
+            transform=LTFArray.transform_atf,
+            combiner=LTFArray.combiner_xor,
+            bias=RandomState(0x4).normal(size=k),
+        )
+        lr_learner = LogisticRegression(training_set, n, k, transformation=LTFArray.transform_atf, bias=True)
+        sub_challenges = LTFArray.transform_atf(training_set.challenges, k)
+        assert_allclose(
+            lr_learner.gradient(model, sub_challenges, training_set.responses),
+            lr_learner.gradient(model, LTFArray.efba_bit(sub_challenges), training_set.responses),
+        )
+
+    def test_gradient_xor(self):
+        """
+        The gradient for the XOR combiner must match the gradient computed separately for each Arbiter chain.
+        """
+        n, k, N = 16, 3, 1000
+        instance = LTFArray(
+            weight_array=LTFArray.normal_weights(n, k, random_instance=RandomState(0x5)),
+            transform=LTFArray.transform_atf,
+            combiner=LTFArray.combiner_xor,
+        )
+        training_set = TrainingSet(instance=instance, N=N, random_instance=RandomState(0x6))
+        model = LTFArray(
+            weight_array=LTFArray.normal_weights(n, k, random_instance=RandomState(0x7)),
+            transform=LTFArray.transform_atf,
+            combiner=LTFArray.combiner_xor,
+        )
+        lr_learner = LogisticRegression(training_set, n, k, transformation=LTFArray.transform_atf)
+        sub_challenges = LTFArray.transform_atf(training_set.challenges, k)
+
+        model_responses = model.core_eval(sub_challenges)
+        combined_model_responses = prod(model_responses, axis=1)
+        combined_model_responses = sign(combined_model_responses) * minimum(np_abs(combined_model_responses), 50)
+        sigmoid_derivative = .5 * (2 / (1 + exp(-combined_model_responses)) - 1 - training_set.responses)
+        expected = zeros((k, n))
+        for l in range(k):
+            chain_gradient = sigmoid_derivative * combined_model_responses / model_responses[:, l]
+            expected[l] = dot(chain_gradient, sub_challenges[:, l])
+
+        assert_allclose(lr_learner.gradient(model, sub_challenges, training_set.responses, block_size=300), expected)
+
+    def test_combiner_gradient_ip_mod2(self):
+        """
+        The vectorized ip_mod2 derivative must match its element-wise definition.
+        """
+        model_responses = RandomState(0x8).normal(size=(100, 4))
+        model_responses[0, 1] = model_responses[0, 0]
+        combined_model_responses = LTFArray.combiner_ip_mod2(model_responses)
+        gradient = LogisticRegression.combiner_gradient(LTFArray.combiner_ip_mod2)(
+            combined_model_responses, model_responses)
+        for i, responses in enumerate(model_responses):
+            for l, response in enumerate(responses):
+                neighbor = responses[l + 1 if l % 2 == 0 else l - 1]
+                expected = 0 if neighbor >= response else combined_model_responses[i] / response
+                self.assertAlmostEqual(gradient[i, l], expected)
+
+    def test_combiner_gradient_xor(self):
+        """
+        The XOR derivative must be the product of all other responses, also if some response is zero.
+        """
+        model_responses = array([[0., 2., 3.], [1e-200, 1e200, 5.], [-1., 2., -3.]])
+        combined_model_responses = LTFArray.combiner_xor(model_responses)
+        old_settings = seterr(all='raise')
+        try:
+            gradient = LogisticRegression.combiner_gradient_xor(combined_model_responses, model_responses)
+        finally:
+            seterr(**old_settings)
+        assert_allclose(gradient, [[6., 0., 0.], [5e200, 5e-200, 1.], [-6., 3., -2.]])
+
+        # capped combined responses scale the derivative
+        gradient = LogisticRegression.combiner_gradient_xor(array([2., 5., 3.]), model_responses)
+        assert_allclose(gradient[2], [-3., 1.5, -1.])
+
+    def test_combiner_gradient_registry(self):
+        """
+        Combiners without registered derivative must be rejected, registered ones must be found.
+        """
+        def combiner_first(responses):
+            """Returns the response of the first LTF."""
+            return responses[:, 0]
+
+        with self.assertRaises(Exception):
+            LogisticRegression.combiner_gradient(combiner_first)
+
+        def gradient_first(_combined_model_responses, model_responses):
+            """Derivative of combiner_first."""
+            gradient = zeros(model_responses.shape)
+            gradient[:, 0] = 1
+            return gradient
+
+        LogisticRegression.register_combiner_gradient(combiner_first, gradient_first)
+        try:
+            self.assertIs(LogisticRegression.combiner_gradient(combiner_first), gradient_first)
+        finally:
+            del LogisticRegression.COMBINER_GRADIENTS['combiner_first']
+
+    def test_learn_float32(self):
+        """
+        Learning in single precision must be as accurate as learning in double precision on k-XOR Arbiter PUFs.
+        """
+        n, k, N = 16, 2, 2000
+        for seed in range(2):
+            instance = LTFArray(
+                weight_array=LTFArray.normal_weights(n, k, random_instance=RandomState(0x100 + seed)),
+                transform=LTFArray.transform_atf,
+                combiner=LTFArray.combiner_xor,
+            )
+            training_set = TrainingSet(instance=instance, N=N, random_instance=RandomState(0x200 + seed))
+            accuracies = {}
+            for precision in ['float64', 'float32']:
+                lr_learner = LogisticRegression(training_set, n, k, transformation=LTFArray.transform_atf,
+                                                weights_prng=RandomState(0x300 + seed), precision=precision)
+                model = lr_learner.learn()
+                self.assertEqual(model.weight_array.dtype, precision)
+                self.assertEqual(lr_learner.updater.step.dtype, precision)
+                accuracies[precision] = 1 - approx_dist(instance, model, 10000, RandomState(0x400))
+            self.assertGreater(accuracies['float64'], .9)
+            self.assertAlmostEqual(accuracies['float32'], accuracies['float64'], delta=.02)
+
+    def test_learn_bias_shuffle(self):
+        """
+        Learning with bias and shuffling must succeed on read-only sub-challenge views.
+        """
+        n, k, N = 16, 1, 2000
+        instance = LTFArray(
+            weight_array=LTFArray.normal_weights(n, k, random_instance=RandomState(0x1)),
+            transform=LTFArray.transform_atf,
+            combiner=LTFArray.combiner_xor,
+            bias=.5,
+        )
+        lr_learner = LogisticRegression(
+            TrainingSet(instance=instance, N=N, random_instance=RandomState(0x2)),
+            n,
+            k,
+            transformation=LTFArray.transform_atf,
+            weights_prng=RandomState(0x3),
+            minibatch_size=500,
+            shuffle=True,
+            bias=True,
+        )
+        model = lr_learner.learn()
+        self.assertGreater(1 - approx_dist(instance, model, 1000, RandomState(0x4)), .9)
+
+    def test_learn_streaming(self):
+        """
+        Learning in streaming mode from a memory-mapped training set must give the same model as learning from the
+        transformed training set in memory.
+        """
+        n, k, N = 16, 2, 2000
+        instance = LTFArray(
+            weight_array=LTFArray.normal_weights(n, k, random_instance=RandomState(0x10)),
+            transform=LTFArray.transform_atf,
+            combiner=LTFArray.combiner_xor,
+        )
+        training_set = TrainingSet(instance=instance, N=N, random_instance=RandomState(0x20))
+        with NamedTemporaryFile(suffix='.npy') as file:
+            training_set.save(file.name)
+            models = {}
+            for streaming in [False, True]:
+                lr_learner = LogisticRegression(
+                    ChallengeResponseSet.load(file.name) if streaming else training_set,
+                    n,
+                    k,
+                    transformation=LTFArray.transform_atf,
+                    weights_prng=RandomState(0x30),
+                    minibatch_size=500,
+                    streaming=streaming,
+                )
+                models[streaming] = lr_learner.learn()
+            assert_allclose(models[True].weight_array, models[False].weight_array)
+        self.assertGreater(1 - approx_dist(instance, models[True], 10000, RandomState(0x40)), .9)
+
+    def test_learn_packed(self):
+        """
+        Learning from a bit-packed training set must give the same model as learning from the unpacked training set.
+        """
+        n, k, N = 16, 2, 2000
+        instance = LTFArray(
+            weight_array=LTFArray.normal_weights(n, k, random_instance=RandomState(0x17)),
+            transform=LTFArray.transform_atf,
+            combiner=LTFArray.combiner_xor,
+        )
+        training_set = TrainingSet(instance=instance, N=N, random_instance=RandomState(0x27))
+        packed_training_set = TrainingSet(instance=instance, N=N, random_instance=RandomState(0x27), packed=True)
+        with patch.object(LogisticRegression, 'UNPACK_BLOCK_SIZE', 300):
+            for streaming in [False, True]:
+                models = [
+                    LogisticRegression(t_set, n, k, transformation=LTFArray.transform_atf,
+                                       weights_prng=RandomState(0x37), minibatch_size=500, shuffle=True,
+                                       streaming=streaming).learn()
+                    for t_set in [training_set, packed_training_set]
+                ]
+                assert_allclose(models[1].weight_array, models[0].weight_array)
+        self.assertGreater(1 - approx_dist(instance, models[1], 10000, RandomState(0x47)), .9)
+
+    def test_learn_prefetch(self):
+        """
+        Learning with minibatches prepared in the background must give the same model as learning without.
+        """
+        n, k, N = 16, 2, 2000
+        instance = LTFArray(
+            weight_array=LTFArray.normal_weights(n, k, random_instance=RandomState(0x11)),
+            transform=LTFArray.transform_atf,
+            combiner=LTFArray.combiner_xor,
+        )
+        for streaming in [False, True]:
+            models = {}
+            for prefetch in [0, 2]:
+                lr_learner = LogisticRegression(
+                    TrainingSet(instance=instance, N=N, random_instance=RandomState(0x21)),
+                    n,
+                    k,
+                    transformation=LTFArray.transform_atf,
+                    weights_prng=RandomState(0x31),
+                    minibatch_size=500,
+                    shuffle=True,
+                    streaming=streaming,
+                    prefetch=prefetch,
+                )
+                models[prefetch] = lr_learner.learn()
+            assert_allclose(models[2].weight_array, models[0].weight_array)
+
+    def test_learn_shuffle(self):
+        """
+        Shuffling must not modify the training set and must give reproducible results.
+        """
+        n, k, N = 16, 2, 2000
+        instance = LTFArray(
+            weight_array=LTFArray.normal_weights(n, k, random_instance=RandomState(0x12)),
+            transform=LTFArray.transform_atf,
+            combiner=LTFArray.combiner_xor,
+        )
+        training_set = TrainingSet(instance=instance, N=N, random_instance=RandomState(0x22))
+        challenges, responses = training_set.challenges.copy(), training_set.responses.copy()
+        models = []
+        for _ in range(2):
+            lr_learner = LogisticRegression(training_set, n, k, transformation=LTFArray.transform_atf,
+                                            weights_prng=RandomState(0x32), minibatch_size=300, shuffle=True)
+            models.append(lr_learner.learn())
+            assert_array_equal(training_set.challenges, challenges)
+            assert_array_equal(training_set.responses, responses)
+        assert_array_equal(models[0].weight_array, models[1].weight_array)
+        self.assertGreater(lr_learner.epoch_count, 1)
+        for number_of_batches in [1, 6, 7]:
+            for batch, indices in zip(LogisticRegression.batch_slices(N, number_of_batches),
+                                      array_split(range(N), number_of_batches)):
+                assert_array_equal(range(N)[batch], indices)
+
+    def test_convergence_monitor(self):
+        """
+        The convergence monitor must evaluate the model like approx_dist_nonrandom and stop learning early.
+        """
+        n, k, N = 32, 2, 3000
+        instance = LTFArray(
+            weight_array=LTFArray.normal_weights(n, k, random_instance=RandomState(0x13)),
+            transform=LTFArray.transform_atf,
+            combiner=LTFArray.combiner_xor,
+        )
+        training_set = TrainingSet(instance=instance, N=N, random_instance=RandomState(0x23))
+        test_set = TrainingSet(instance=instance, N=1000, random_instance=RandomState(0x43))
+
+        def learner(**kwargs):
+            return LogisticRegression(training_set, n, k, transformation=LTFArray.transform_atf,
+                                      weights_prng=RandomState(0x33), minibatch_size=100, test_set=test_set, **kwargs)
+
+        lr_learner = learner()
+        model = lr_learner.learn()
+        self.assertAlmostEqual(lr_learner.test_set_dist, approx_dist_nonrandom(model, test_set))
+        self.assertEqual(lr_learner.monitor.evaluation_count, lr_learner.gradient_step_count + 1)
+        self.assertIsNone(lr_learner.monitor.stop_reason)
+
+        lr_learner = learner(test_interval=5, target_accuracy=.9)
+        model = lr_learner.learn()
+        self.assertEqual(lr_learner.monitor.stop_reason, 'target accuracy reached')
+        self.assertEqual(lr_learner.gradient_step_count % 5, 0)
+        self.assertGreaterEqual(1 - approx_dist_nonrandom(model, test_set), .9)
+
+        lr_learner = learner(patience=0)
+        lr_learner.learn()
+        self.assertEqual(lr_learner.monitor.stop_reason, 'no improvement')
+        self.assertEqual(lr_learner.monitor.evaluation_count, lr_learner.monitor.best_evaluation + 1)
+
+        # the monitor must follow changes of its parameters and of the test set between runs
+        sub_challenges = lr_learner.monitor.sub_challenges
+        lr_learner.patience, lr_learner.target_accuracy = None, .9
+        lr_learner.learn()
+        self.assertEqual((lr_learner.monitor.patience, lr_learner.monitor.target_accuracy), (None, .9))
+        self.assertNotEqual(lr_learner.monitor.stop_reason, 'no improvement')
+        self.assertIs(lr_learner.monitor.sub_challenges, sub_challenges)
+        lr_learner.test_set = TrainingSet(instance=instance, N=1000, random_instance=RandomState(0x53))
+        model = lr_learner.learn()
+        self.assertAlmostEqual(lr_learner.test_set_dist, approx_dist_nonrandom(model, lr_learner.test_set))
+
+        transformed_test_set = ChallengeResponseSet(LTFArray.transform_atf(test_set.challenges, k), test_set.responses)
+        monitor = LogisticRegression.ConvergenceMonitor(transformed_test_set, None, k)
+        self.assertAlmostEqual(monitor.evaluate(model), 1 - approx_dist_nonrandom(model, test_set))
+
+    def test_learn_restarts(self):
+        """
+        Learning several models at once must give the same models as learning them one after another.
+        """
+        n, k, N, restarts = 16, 2, 2000, 3
+        instance = LTFArray(
+            weight_array=LTFArray.normal_weights(n, k, random_instance=RandomState(0x14)),
+            transform=LTFArray.transform_atf,
+            combiner=LTFArray.combiner_xor,
+            bias=.3,
+        )
+        training_set = TrainingSet(instance=instance, N=N, random_instance=RandomState(0x24))
+        test_set = TrainingSet(instance=instance, N=1000, random_instance=RandomState(0x44))
+        for bias in [False, True]:
+            weights_prng = RandomState(0x34)
+            learners = [
+                LogisticRegression(training_set, n, k, transformation=LTFArray.transform_atf, weights_prng=weights_prng,
+                                   minibatch_size=500, bias=bias)
+                for _ in range(restarts)
+            ]
+            models = [learner.learn() for learner in learners]
+            lr_learner = LogisticRegression(training_set, n, k, transformation=LTFArray.transform_atf,
+                                            weights_prng=RandomState(0x34), minibatch_size=500, bias=bias)
+            best_model = lr_learner.learn_restarts(restarts)
+            self.assertEqual(len(lr_learner.restarts), restarts)
+            for learner, restart in zip(learners, lr_learner.restarts):
+                self.assertTrue(restart.converged)
+                self.assertEqual(restart.gradient_step_count, learner.gradient_step_count)
+                self.assertAlmostEqual(restart.training_set_accuracy, learner.training_set_dist_sign)
+            training_set_accuracies = [restart.training_set_accuracy for restart in lr_learner.restarts]
+            best = training_set_accuracies.index(max(training_set_accuracies))
+            assert_allclose(best_model.weight_array, models[best].weight_array)
+
+        lr_learner = LogisticRegression(training_set, n, k, transformation=LTFArray.transform_atf,
+                                        weights_prng=RandomState(0x34), minibatch_size=500, test_set=test_set,
+                                        bias=True, target_accuracy=.9)
+        best_model = lr_learner.learn_restarts(restarts)
+        self.assertEqual(sum(restart.stop_reason == 'target accuracy reached' for restart in lr_learner.restarts), 1)
+        self.assertGreaterEqual(1 - approx_dist_nonrandom(best_model, test_set), .9)
+
+    def test_batch_gradient_max_memory(self):
+        """
+        Computing the gradients of several models in blocks that fit into max_memory must give the same gradients
+        as computing them at once, while using about max_memory.
+        """
+        n, k, N, restarts, max_memory = 64, 4, 20000, 4, 2**20
+        instance = LTFArray(
+            weight_array=LTFArray.normal_weights(n, k, random_instance=RandomState(0x16)),
+            transform=LTFArray.transform_atf,
+            combiner=LTFArray.combiner_xor,
+        )
+        training_set = TrainingSet(instance=instance, N=N, random_instance=RandomState(0x26))
+        sub_challenges = LTFArray.transform_atf(training_set.challenges, k)
+        weight_arrays = RandomState(0x36).normal(size=(restarts, k, n + 1))
+        lr_learner = LogisticRegression(training_set, n, k, transformation=LTFArray.transform_atf,
+                                        max_memory=max_memory)
+        self.assertLess(lr_learner.batch_gradient_block_size(restarts), N)
+
+        start()
+        gradients, accuracies = lr_learner.batch_gradient(weight_arrays, sub_challenges, training_set.responses)
+        peak_memory = get_traced_memory()[1]
+        stop()
+        self.assertLess(peak_memory, 2 * max_memory)
+        expected_gradients, expected_accuracies = lr_learner.batch_gradient(
+            weight_arrays, sub_challenges, training_set.responses, block_size=N)
+        assert_allclose(gradients, expected_gradients)
+        assert_allclose(accuracies, expected_accuracies)
+
+    def test_learn_restarts_initialized(self):
+        """
+        Learning several given models at once must give the same models as continuing to learn each of them.
+        """
+        n, k, N, restarts = 16, 2, 2000, 3
+        instance = LTFArray(
+            weight_array=LTFArray.normal_weights(n, k, random_instance=RandomState(0x15)),
+            transform=LTFArray.transform_atf,
+            combiner=LTFArray.combiner_xor,
+        )
+        training_set = TrainingSet(instance=instance, N=N, random_instance=RandomState(0x25))
+        test_set = TrainingSet(instance=instance, N=1000, random_instance=RandomState(0x45))
+        init_weight_arrays = LTFArray.normal_weights(n + 1, k * restarts, random_instance=RandomState(0x35))
+        init_weight_arrays = init_weight_arrays.reshape(restarts, k, n + 1)
+        updater = LogisticRegression.RPropModelUpdate(LTFArray(zeros((k, n)), LTFArray.transform_atf,
+                                                               LTFArray.combiner_xor))
+        updater.step_size *= 10
+
+        def learner():
+            return LogisticRegression(training_set, n, k, transformation=LTFArray.transform_atf, minibatch_size=500)
+
+        learners = [learner() for _ in range(restarts)]
+        models = []
+        for lr_learner, init_weight_array in zip(learners, init_weight_arrays):
+            lr_learner.updater = deepcopy(updater)
+            models.append(lr_learner.learn(init_weight_array=init_weight_array.copy(), refresh_updater=False))
+        lr_learner = learner()
+        lr_learner.learn_restarts(restarts, init_weight_arrays=init_weight_arrays,
+                                  updaters=[deepcopy(updater) for _ in range(restarts)])
+        for sequential_learner, model, restart in zip(learners, models, lr_learner.restarts):
+            self.assertEqual(restart.gradient_step_count, sequential_learner.gradient_step_count)
+            assert_allclose(restart.model.weight_array, model.weight_array)
+
+        monitor = LogisticRegression.ConvergenceMonitor(test_set, LTFArray.transform_atf, k, target_accuracy=.9)
+        lr_learner = learner()
+        best_model = lr_learner.learn_restarts(restarts, init_weight_arrays=init_weight_arrays, monitor=monitor)
+        self.assertEqual(sum(restart.stop_reason == 'target accuracy reached' for restart in lr_learner.restarts), 1)
+        self.assertGreaterEqual(1 - approx_dist_nonrandom(best_model, test_set), .9)
+        self.assertIsNone(lr_learner.monitor)
+
+    def test_rprop_update(self):
+        """
+        The RProp update of all chains at once must equal the RProp update of each chain on its own.
+        """
+        n, k = 16, 4
+        model = LTFArray(LTFArray.normal_weights(n, k, random_instance=RandomState(0x15)), LTFArray.transform_atf,
+                         LTFArray.combiner_xor)
+        updater = LogisticRegression.RPropModelUpdate(model, bias=True)
+        step_size = full((k, n + 1), 1.0)
+        last_gradient = full((k, n + 1), 1.0)
+        last_step = zeros((k, n + 1))
+        prng = RandomState(0x25)
+        for _ in range(100):
+            # gradients with zeros and partial derivatives that keep or change their sign
+            gradient = prng.normal(size=(k, n + 1)) * (prng.random_sample(size=(k, n + 1)) > .1)
+            step = zeros((k, n + 1))
+            for l in range(k):
+                for j in range(n + 1):
+                    indicator = sign(gradient[l, j] * last_gradient[l, j])
+                    if indicator > 0:
+                        step_size[l, j] = min(step_size[l, j] * 1.2, 10)
+                        step[l, j] = -step_size[l, j] * sign(gradient[l, j])
+                        last_gradient[l, j] = gradient[l, j]
+                    elif indicator < 0:
+                        step_size[l, j] = max(step_size[l, j] * .5, 10**-4)
+                        step[l, j] = -last_step[l, j]
+                        last_gradient[l, j] = 0
+                    else:
+                        step[l, j] = -step_size[l, j] * sign(gradient[l, j])
+                        last_gradient[l, j] = gradient[l, j]
+            last_step = step
+            assert_array_equal(updater.update(gradient), step)
+            assert_array_equal(updater.step_size, step_size)
+
+    def test_learn_model_updates(self):
+        """
+        Learning with the iRprop- and Adam model updates must succeed on k-XOR Arbiter PUFs.
+        """
+        n, k, N = 16, 2, 2000
+        instance = LTFArray(
+            weight_array=LTFArray.normal_weights(n, k, random_instance=RandomState(0x16)),
+            transform=LTFArray.transform_atf,
+            combiner=LTFArray.combiner_xor,
+        )
+        training_set = TrainingSet(instance=instance, N=N, random_instance=RandomState(0x26))
+        for model_update in [LogisticRegression.IRPropMinusModelUpdate, LogisticRegression.AdamModelUpdate]:
+            lr_learner = LogisticRegression(training_set, n, k, transformation=LTFArray.transform_atf,
+                                            weights_prng=RandomState(0x36), model_update=model_update,
+                                            iteration_limit=300)
+            model = lr_learner.learn()
+            self.assertIsInstance(lr_learner.updater, model_update)
+            self.assertGreater(1 - approx_dist(instance, model, 10000, RandomState(0x46)), .9)
@@ -4,7 +4,7 @@ This module is used to test the different simulation models.
 
 import unittest
 from test.utility import get_functions_with_prefix
-from numpy.testing import assert_array_equal
+from numpy.testing import assert_array_equal, assert_allclose
 from numpy import shape, dot, array, around, array_equal, reshape, zeros
 from numpy.random import RandomState
 from pypuf.simulation.arbiter_based.ltfarray import LTFArray, NoisyLTFArray, SimulationMajorityLTFArray
@@ -219,6 +219,14 @@ class TestInputTransformation(unittest.TestCase):
             ]
         )
 
+    def test_secure_lightweight_legacy(self):
+        """This method tests that the secure lightweight transformation matches the reference implementation."""
+        for n, k in [(4, 1), (6, 8), (64, 4), (64, 70)]:
+            challenges = tools.random_inputs(n, 100, RandomState(n + k))
+            transformed = LTFArray.transform_lightweight_secure(challenges, k)
+            assert_array_equal(transformed, LTFArray.transform_lightweight_secure_legacy(challenges, k))
+            self.assertEqual(transformed.dtype, challenges.dtype)
+
     def test_att(self):
         """Test the ATT by providing a simple input-output sample."""
         test_array = array([[
@@ -417,6 +425,38 @@ class TestInputTransformation(unittest.TestCase):
             ]
         )
 
+    def test_random(self):
+        """This method tests the random transformation for determinism, balance and independence of k."""
+        for n in [6, 64, 65, 128]:
+            challenges = tools.random_inputs(n, 1000, RandomState(0xbeef))
+            transformed = LTFArray.transform_random(challenges, k=4)
+            self.assertEqual(transformed.shape, (1000, 4, n))
+            self.assertEqual(transformed.dtype, tools.BIT_TYPE)
+            assert_array_equal(transformed, LTFArray.transform_random(challenges, k=4))
+            assert_array_equal(transformed[:, :2], LTFArray.transform_random(challenges, k=2))
+            self.assertLess(abs(transformed.mean()), .05)
+            self.assertFalse(array_equal(transformed[:, 0], transformed[:, 1]))
+
+    def test_random_legacy(self):
+        """This method tests the legacy random transformation with predefined input and output for k=2 PUFs."""
+        test_array = array([
+            [1, -1, -1, 1, -1, 1],
+            [-1, 1, 1, -1, -1, 1],
+        ], dtype=tools.BIT_TYPE)
+        assert_array_equal(
+            LTFArray.transform_random_legacy(test_array, k=2),
+            [
+                [
+                    [-1, -1, -1, -1, -1, 1],
+                    [1, -1, -1, 1, 1, -1]
+                ],
+                [
+                    [-1, -1, 1, 1, -1, -1],
+                    [-1, -1, -1, -1, -1, -1]
+                ]
+            ]
+        )
+
 
 class TestLTFArray(unittest.TestCase):
     """
@@ -561,6 +601,27 @@ class TestLTFArray(unittest.TestCase):
             self.assertTupleEqual(shape(fast_evaluation_result), (N, k))
             assert_array_equal(slow_evaluation_result, fast_evaluation_result)
 
+    def test_core_eval_bias(self):
+        """
+        Bias-aware evaluation of sub-challenges must equal the evaluation of "efba" sub-challenges.
+        """
+        n, k, N = 32, 3, 100
+        ltf_array = LTFArray(
+            weight_array=LTFArray.normal_weights(n, k, random_instance=RandomState(0xC0DE)),
+            transform=LTFArray.transform_atf,
+            combiner=LTFArray.combiner_xor,
+            bias=RandomState(0xB1A5).normal(size=k),
+        )
+        sub_challenges = LTFArray.transform_atf(tools.random_inputs(n, N, RandomState(0xCAFE)), k)
+        assert_allclose(
+            ltf_array.core_eval(sub_challenges, bias=True),
+            ltf_array.core_eval(LTFArray.efba_bit(sub_challenges)),
+        )
+        assert_allclose(
+            ltf_array.core_eval(sub_challenges),
+            ltf_array.core_eval(LTFArray.efba_bit(sub_challenges)) - ltf_array.weight_array[:, -1],
+        )
+
 
 class TestNoisyLTFArray(TestLTFArray):
     """This class is used to test the NoisyLTFArray class."""
@@ -765,6 +826,19 @@ class TestSimulationMajorityLTFArray(unittest.TestCase):
         mv_noisy_ltf_array_result = mv_noisy_ltf_array.eval(inputs)
         assert_array_equal(mv_noisy_ltf_array_result, ltf_array_result)
 
+    def test_ltf_eval(self):
+        """
+        ltf_eval gives the noiseless real-valued LTF outputs as for LTFArray, the majority vote is only applied by val.
+        """
+        n, k, N = 16, 4, 100
+        weight_array = LTFArray.normal_weights(n, k, random_instance=RandomState(0x1E7))
+        mv_noisy_ltf_array = SimulationMajorityLTFArray(weight_array, LTFArray.transform_atf, LTFArray.combiner_xor,
+                                                        sigma_noise=1, vote_count=5)
+        ltf_array = LTFArray(weight_array, LTFArray.transform_atf, LTFArray.combiner_xor)
+        sub_challenges = LTFArray.transform_atf(tools.random_inputs(n, N, RandomState(0x2E7)), k)
+        assert_array_equal(mv_noisy_ltf_array.ltf_eval(sub_challenges), ltf_array.ltf_eval(sub_challenges))
+        self.assertEqual(set(mv_noisy_ltf_array.majority_vote(sub_challenges).flatten()), {-1, 1})
+
     def test_transformations_combiner(self):
         """
         This test checks all combinations of transformations and combiners for SimulationMajorityLTFArray to run.
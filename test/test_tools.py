@@ -1,5 +1,6 @@
 """This module is used to test the functions which are implemented in pypuf.tools."""
 import unittest
+from unittest.mock import patch
 from numpy import zeros, dtype, array_equal, array, column_stack
 from numpy.random import RandomState
 from numpy.testing import assert_array_equal
@@ -7,7 +8,8 @@ from tempfile import NamedTemporaryFile
 from pypuf.simulation.arbiter_based.ltfarray import LTFArray
 from pypuf.tools import random_input, all_inputs, random_inputs, sample_inputs, chi_vectorized, append_last, \
     TrainingSet, BIT_TYPE, transform_challenge_11_to_01, transform_challenge_01_to_11, poly_mult_div, \
-    parse_file
+    parse_file, PackedChallenges, ChallengeResponseSet, WORD_TYPE, permutation_table, sequential_permutation_table, \
+    prefetched, pack_bits, popcount
 
 
 class TestAppendLast(unittest.TestCase):
@@ -156,6 +158,81 @@ class TestInputFunctions(unittest.TestCase):
         poly_mult_div(challenges_01, irreducible_polynomial, k)
         self.check_multi_dimensional_array(challenges_01, N, n, BIT_TYPE)
 
+    def test_poly_mult_div_values(self):
+        """This method checks poly_mult_div against a straightforward computation in GF(2^n)."""
+        def gf2n_mult_reference(a, b, modulus):
+            """Carry-less multiplication of Python integers, followed by reduction."""
+            n = modulus.bit_length() - 1
+            product = 0
+            for i in range(b.bit_length()):
+                if b >> i & 1:
+                    product ^= a << i
+            for i in reversed(range(n, product.bit_length())):
+                if product >> i & 1:
+                    product ^= modulus << (i - n)
+            return product
+
+        k = 3
+        for irreducible_polynomial in [
+                array([1, 0, 1, 0, 0, 1, 1, 0, 1], dtype=BIT_TYPE),
+                array([1, 1, 0, 1, 1] + [0] * 59 + [1], dtype=BIT_TYPE),
+        ]:
+            n = len(irreducible_polynomial) - 1
+            modulus = int(''.join(map(str, irreducible_polynomial)), 2)
+            challenges_01 = (random_inputs(n, 20, RandomState(n)) < 0).astype(BIT_TYPE)
+            powers = poly_mult_div(challenges_01, irreducible_polynomial, k)
+            self.assertTupleEqual(powers.shape, (20, k, n))
+            for challenge, challenge_powers in zip(challenges_01, powers):
+                assert_array_equal(poly_mult_div(challenge, irreducible_polynomial, k), challenge_powers)
+                c = int(''.join(map(str, challenge)), 2)
+                power = c
+                for i in range(k):
+                    power = gf2n_mult_reference(power, c, modulus)
+                    self.assertEqual(int(''.join(map(str, challenge_powers[i])), 2), power)
+
+    def test_permutation_tables(self):
+        """This method checks the cached permutation index tables."""
+        table = permutation_table((1, 2, 3), 16)
+        self.assertTupleEqual(table.shape, (3, 16))
+        for seed, permutation in zip((1, 2, 3), table):
+            assert_array_equal(permutation, RandomState(seed).permutation(16))
+        self.assertIs(table, permutation_table((1, 2, 3), 16))
+        self.assertFalse(table.flags.writeable)
+
+        table = sequential_permutation_table(4, 16, 3)
+        prng = RandomState(4)
+        for permutation in table:
+            assert_array_equal(permutation, prng.permutation(16))
+        self.assertIs(table, sequential_permutation_table(4, 16, 3))
+
+    def test_prefetched(self):
+        """Prefetched iterables keep their order, raise exceptions in the iterating thread and can be closed early."""
+        self.assertEqual(list(prefetched(range(100), size=3)), list(range(100)))
+
+        def failing():
+            yield 1
+            raise ValueError()
+
+        items = prefetched(failing())
+        self.assertEqual(next(items), 1)
+        with self.assertRaises(ValueError):
+            next(items)
+
+        items = prefetched(iter(range(10**9)), size=2)
+        self.assertEqual(next(items), 0)
+        items.close()
+
+    def test_pack_bits_popcount(self):
+        """Packed bits must keep their number of set bits, regardless of padding."""
+        prng = RandomState(0xB17)
+        for N in [1, 63, 64, 65, 1000]:
+            bits = prng.randint(0, 2, size=(3, 5, N)).astype(bool)
+            words = pack_bits(bits)
+            self.assertEqual(words.shape, (3, 5, (N + 63) // 64))
+            self.assertEqual(words.dtype, WORD_TYPE)
+            assert_array_equal(popcount(words), bits.sum(axis=-1))
+            assert_array_equal(popcount(words ^ pack_bits(~bits)), N)
+
     def test_parse_file(self):
         """This method checks reading challenge-response pairs from a file."""
         n, k, N = 128, 1, 10
@@ -172,6 +249,20 @@ class TestInputFunctions(unittest.TestCase):
         assert_array_equal(original.responses, loaded.responses)
         f.close()
 
+    def test_parse_file_packed(self):
+        """This method checks reading challenge-response pairs from a file into packed challenges."""
+        n, N = 65, 10
+        challenges = random_inputs(n, N, RandomState(0xF11E))
+        f = NamedTemporaryFile('w')
+        for vals in column_stack((challenges, challenges[:, 0])):
+            f.write(' '.join(map(str, vals)) + '\n')
+        f.flush()
+
+        loaded = parse_file(f.name, n, in_11_notation=True, packed=True)
+        self.assertIsInstance(loaded.challenges, PackedChallenges)
+        assert_array_equal(challenges, loaded.challenges.unpack())
+        f.close()
+
     def check_multi_dimensional_array(self, arr, arr_size, sub_arr_size, arr_type):
         """This method checks the shape and type of two dimensional arrays.
         :param arr: array of type arr_type
@@ -184,3 +275,101 @@ class TestInputFunctions(unittest.TestCase):
             self.assertEqual(len(arr[i]), sub_arr_size,
                              'The sub array does not match the length of {0}.'.format(sub_arr_size))
             self.assertEqual(arr.dtype, arr_type, 'The array must be of type {0}'.format(arr_type))
+
+
+class TestPackedChallenges(unittest.TestCase):
+    """This class tests the bit-packed challenge representation."""
+
+    def test_pack_unpack(self):
+        """Packing and unpacking must give the original challenges for all challenge lengths."""
+        for n in [1, 8, 63, 64, 65, 128, 200]:
+            challenges = random_inputs(n, 100, RandomState(n))
+            packed = PackedChallenges.pack(challenges)
+            self.assertEqual(packed.words.dtype, dtype(WORD_TYPE))
+            self.assertTupleEqual(packed.words.shape, (100, (n + 63) // 64))
+            self.assertTupleEqual(packed.shape, (100, n))
+            unpacked = packed.unpack()
+            self.assertEqual(unpacked.dtype, dtype(BIT_TYPE))
+            assert_array_equal(unpacked, challenges)
+
+    def test_bit_order(self):
+        """Challenge bit i is stored at bit i % 64 of word i // 64, -1 is stored as 1."""
+        challenges = array([[-1, 1, 1, -1] + [1] * 60 + [-1]], dtype=BIT_TYPE)
+        packed = PackedChallenges.pack(challenges)
+        assert_array_equal(packed.words, array([[0b1001, 1]], dtype=WORD_TYPE))
+
+    def test_random_inputs_packed(self):
+        """Packed random inputs must equal the packed unpacked random inputs for the same seed."""
+        for n in [8, 64, 100]:
+            for N in [1, 3, 1000, 2 ** 16 + 5]:
+                assert_array_equal(
+                    random_inputs(n, N, RandomState(0xBEEF), packed=True).unpack(),
+                    random_inputs(n, N, RandomState(0xBEEF)),
+                )
+
+    def test_suffix_parity(self):
+        """The suffix parity of packed challenges must equal the ATF transform."""
+        for n in [8, 64, 65, 128, 130]:
+            challenges = random_inputs(n, 100, RandomState(n))
+            assert_array_equal(
+                PackedChallenges.pack(challenges).suffix_parity().unpack(),
+                LTFArray.transform_atf(challenges, 1)[:, 0, :],
+            )
+
+    def test_indexing(self):
+        """Integer indices give single challenges, other indices give packed challenges."""
+        challenges = random_inputs(70, 20, RandomState(0x1D))
+        packed = PackedChallenges.pack(challenges)
+        assert_array_equal(packed[3], challenges[3])
+        self.assertIsInstance(packed[2:5], PackedChallenges)
+        assert_array_equal(packed[2:5].unpack(), challenges[2:5])
+        assert_array_equal(packed[range(4, 9)].unpack(), challenges[4:9])
+
+    def test_challenge_response_set(self):
+        """Challenge response sets can be converted to and from packed challenges."""
+        n, k, N = 64, 2, 500
+        instance = LTFArray(LTFArray.normal_weights(n, k, random_instance=RandomState(0x5E7)), LTFArray.transform_atf,
+                            LTFArray.combiner_xor)
+        training_set = TrainingSet(instance, N, RandomState(0xC1))
+        packed_training_set = TrainingSet(instance, N, RandomState(0xC1), packed=True)
+        self.assertIsInstance(packed_training_set.challenges, PackedChallenges)
+        assert_array_equal(packed_training_set.responses, training_set.responses)
+        self.assertEqual(packed_training_set.challenges, training_set.pack().challenges)
+        assert_array_equal(packed_training_set.unpack().challenges, training_set.challenges)
+        subset = packed_training_set.block_subset(1, 2)
+        self.assertIsInstance(subset, ChallengeResponseSet)
+        assert_array_equal(subset.unpack().challenges, training_set.block_subset(1, 2).challenges)
+
+    def test_save_load(self):
+        """Challenge response sets can be saved to disk and loaded, memory-mapped or not."""
+        n, k, N = 64, 2, 500
+        instance = LTFArray(LTFArray.normal_weights(n, k, random_instance=RandomState(0x5E7)), LTFArray.transform_atf,
+                            LTFArray.combiner_xor)
+        training_set = TrainingSet(instance, N, RandomState(0xC1))
+        with NamedTemporaryFile(suffix='.npy') as file:
+            training_set.save(file.name, block_size=128)
+            for mmap_mode in ['r', None]:
+                loaded = ChallengeResponseSet.load(file.name, mmap_mode=mmap_mode)
+                self.assertEqual(loaded.N, N)
+                assert_array_equal(loaded.challenges, training_set.challenges)
+                assert_array_equal(loaded.responses, training_set.responses)
+
+    def test_save_load_packed(self):
+        """Packed challenge response sets are saved block by block and loaded with the same challenges."""
+        n, N, block_size = 100, 500, 128
+        challenges = PackedChallenges.pack(random_inputs(n, N, RandomState(0xC2)))
+        training_set = ChallengeResponseSet(challenges, RandomState(0xC3).choice([-1, 1], N).astype(BIT_TYPE))
+        unpacked_sizes = []
+
+        def unpack(packed_challenges):
+            unpacked_sizes.append(len(packed_challenges))
+            return unpack.original(packed_challenges)
+        unpack.original = PackedChallenges.unpack
+
+        with NamedTemporaryFile(suffix='.npy') as file:
+            with patch.object(PackedChallenges, 'unpack', unpack):
+                training_set.save(file.name, block_size=block_size)
+            self.assertLessEqual(max(unpacked_sizes), block_size)
+            loaded = ChallengeResponseSet.load(file.name)
+            assert_array_equal(loaded.challenges, challenges.unpack())
+            assert_array_equal(loaded.responses, training_set.responses)